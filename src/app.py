@@ -1,23 +1,33 @@
+import time
+
+_import_started = time.perf_counter()
+
 import dash
 from dash import dcc, html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ALL, Input, Output, State
+from dash.exceptions import PreventUpdate
 import pandas as pd
-import base64
 import os
 import plotly.express as px
-from fetch import fetch_and_pivot_sensor_data, fetch_sensebox_info
+from fetch import (
+    fetch_data_version,
+    fetch_forecast,
+    fetch_latest_forecast_run,
+    fetch_latest_values,
+    fetch_rollup,
+    fetch_sensebox_info,
+    get_daily_stats,
+)
+from db import DEFAULT_SENSEBOX_ID, pool_stats
 from datetime import datetime, timedelta
 from astral import LocationInfo
 from astral.sun import sun
 import pytz
-from neuralprophet import NeuralProphet
-import shutil
 import warnings
 import threading
-from initialize import update_data
-from scheduler import start_scheduler
-from utils import fetch_and_prepare_data, train_and_predict, train_and_update_forecast
+from flask import jsonify
+from icons import icon_url, load_icon_registry, register_icon_route
 
 warnings.filterwarnings("ignore", category=FutureWarning)
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -31,24 +41,59 @@ SVG_DIR = os.path.abspath(os.path.join(CURRENT_DIR, "..", "svg"))
 # Initialize the Dash app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
-# Initialize the global forecast_df
-forecast_df = pd.DataFrame()
+# Load the SVG icons once and serve them as cacheable assets
+ICONS = load_icon_registry(SVG_DIR)
+register_icon_route(app.server, ICONS)
 
 # Initialize the global aggregated_df
 aggregated_df = pd.DataFrame()
 
+# Sensebox shown on the dashboard
+SENSEBOX_ID = DEFAULT_SENSEBOX_ID
+
+# Placeholder shown until the first refresh has filled in a value
+PLACEHOLDER = "–"
+
+# Number of completed days shown in the daily cards
+DAILY_STATS_DAYS = 5
+
+# Sensors of the two KPI card rows
+KPI_ROWS = [
+    [
+        "Temperature in °C",
+        "Humidity in %",
+        "Windspeed in m/s",
+        "UV-B Radiation in W/m2",
+    ],
+    [
+        "Pressure in hPa",
+        "Rain (1h) in mm",
+        "Wind Direction in °",
+        "UV-A Radiation in W/m2",
+    ],
+]
+
+# Startup state: the layout is served right away with placeholder values while
+# a background warm-up loads the data; /ready reports when it has finished.
+# The warm-up is started by the first request (also under a WSGI server) and
+# retried after WARM_UP_RETRY_SECONDS if it failed
+_startup = {"ready": False, "error": None, "timings": {}, "last_attempt": None}
+WARM_UP_RETRY_SECONDS = 30
+_sensebox = {}
+_warmup_lock = threading.Lock()
+
+
+def get_icon_url(filename):
+    return icon_url(ICONS, filename)
 
-def get_last_valid_value(df, column):
-    return df[column].dropna().iloc[-1]
 
+# Ids of the individual values and icons that update_dashboard refreshes
+def value_id(name):
+    return {"type": "dashboard-value", "name": name}
 
-def load_svg_icon(filename):
-    CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-    SVG_DIR = os.path.abspath(os.path.join(CURRENT_DIR, "..", "svg"))
-    icon_path = os.path.join(SVG_DIR, filename)
-    if not os.path.exists(icon_path):
-        raise FileNotFoundError(f"No such file or directory: '{icon_path}'")
-    return base64.b64encode(open(icon_path, "rb").read()).decode("ascii")
+
+def icon_id(name):
+    return {"type": "dashboard-icon", "name": name}
 
 
 def calculate_sun_times(lat, lon):
@@ -64,8 +109,7 @@ def calculate_sun_times(lat, lon):
     return s["sunrise"].strftime("%H:%M"), s["sunset"].strftime("%H:%M")
 
 
-def create_sensor_card(title, value, icon_filename):
-    encoded_image = load_svg_icon(icon_filename)
+def create_sensor_card(title, value, icon_filename, name):
     return dbc.Card(
         dbc.CardBody(
             [
@@ -84,6 +128,7 @@ def create_sensor_card(title, value, icon_filename):
                                 ),
                                 html.Span(
                                     value,
+                                    id=value_id(name),
                                     className="card-value",
                                     style={
                                         "display": "block",
@@ -96,7 +141,7 @@ def create_sensor_card(title, value, icon_filename):
                         ),
                         html.Div(
                             html.Img(
-                                src=f"data:image/svg+xml;base64,{encoded_image}",
+                                src=get_icon_url(icon_filename),
                                 className="card-icon",
                                 style={"height": "60px", "width": "60px"},
                             ),
@@ -119,20 +164,18 @@ def create_sensor_card(title, value, icon_filename):
     )
 
 
-def create_sensebox_info_card(info, sunrise_time, sunset_time):
-    encoded_sunrise_icon = load_svg_icon("wi-sunrise.svg")
-    encoded_sunset_icon = load_svg_icon("wi-sunset.svg")
-
+def create_sensebox_info_card():
     sunrise_card = dbc.Col(
         dbc.Card(
             dbc.CardBody(
                 [
                     html.Img(
-                        src=f"data:image/svg+xml;base64,{encoded_sunrise_icon}",
+                        src=get_icon_url("wi-sunrise.svg"),
                         style={"height": "60px", "width": "60px"},
                     ),
                     html.Span(
-                        sunrise_time,
+                        PLACEHOLDER,
+                        id=value_id("sunrise"),
                         className="card-value",
                         style={
                             "display": "block",
@@ -155,11 +198,12 @@ def create_sensebox_info_card(info, sunrise_time, sunset_time):
             dbc.CardBody(
                 [
                     html.Img(
-                        src=f"data:image/svg+xml;base64,{encoded_sunset_icon}",
+                        src=get_icon_url("wi-sunset.svg"),
                         style={"height": "60px", "width": "60px"},
                     ),
                     html.Span(
-                        sunset_time,
+                        PLACEHOLDER,
+                        id=value_id("sunset"),
                         className="card-value",
                         style={
                             "display": "block",
@@ -180,16 +224,13 @@ def create_sensebox_info_card(info, sunrise_time, sunset_time):
     return dbc.Card(
         dbc.CardBody(
             [
-                html.H2(info["name"], className="card-title"),
-                create_info_row("Exposure", info["exposure"]),
-                create_info_row(
-                    "Aufgestellt am", info["created_at"].strftime("%d.%m.%Y")
+                html.H2(
+                    PLACEHOLDER, id=value_id("sensebox-name"), className="card-title"
                 ),
-                create_info_row(
-                    "Letze Messung",
-                    info["last_measurement_at"].strftime("%d.%m.%Y %H:%M"),
-                ),
-                create_info_row("Beschreibung", info["description"]),
+                create_info_row("Exposure", "sensebox-exposure"),
+                create_info_row("Aufgestellt am", "sensebox-created-at"),
+                create_info_row("Letze Messung", "sensebox-last-measurement"),
+                create_info_row("Beschreibung", "sensebox-description"),
                 dbc.Row([sunrise_card, sunset_card], style={"marginTop": "20px"}),
             ],
         ),
@@ -201,7 +242,21 @@ def create_sensebox_info_card(info, sunrise_time, sunset_time):
     )
 
 
-def create_info_row(title, value):
+def sensebox_info_values(info, sunrise_time, sunset_time):
+    return {
+        "sensebox-name": info["name"],
+        "sensebox-exposure": info["exposure"],
+        "sensebox-created-at": info["created_at"].strftime("%d.%m.%Y"),
+        "sensebox-last-measurement": info["last_measurement_at"].strftime(
+            "%d.%m.%Y %H:%M"
+        ),
+        "sensebox-description": info["description"],
+        "sunrise": sunrise_time,
+        "sunset": sunset_time,
+    }
+
+
+def create_info_row(title, name):
     return html.Div(
         [
             html.Div(
@@ -216,7 +271,8 @@ def create_info_row(title, value):
                         },
                     ),
                     html.Span(
-                        value,
+                        PLACEHOLDER,
+                        id=value_id(name),
                         className="card-value",
                         style={"display": "block", "fontSize": "20px"},
                     ),
@@ -232,30 +288,6 @@ def create_info_row(title, value):
     )
 
 
-def calculate_daily_stats(df):
-    stats = []
-    for i in range(1, 6):
-        day = datetime.now() - timedelta(days=i)
-        day_str = day.strftime("%Y-%m-%d")
-        day_data = df[df["created_at"].dt.strftime("%Y-%m-%d") == day_str]
-        if not day_data.empty:
-            max_temp = day_data["Temperature in °C"].max()
-            min_temp = day_data["Temperature in °C"].min()
-            sum_rain = day_data["Rain (1h) in mm"].sum()
-            avg_radiation = day_data["Global Radiation in W/m2"].mean()
-            stats.append(
-                {
-                    "day": day.strftime("%A")[:3],
-                    "date": day.strftime("%d.%m"),
-                    "max_temp": max_temp,
-                    "min_temp": min_temp,
-                    "sum_rain": sum_rain,
-                    "avg_radiation": avg_radiation,
-                }
-            )
-    return stats[::-1]
-
-
 def get_weather_icon(stats):
     if stats["sum_rain"] > 15:
         return "wi-day-rain.svg"
@@ -265,25 +297,30 @@ def get_weather_icon(stats):
         return "wi-day-cloudy.svg"
 
 
-def create_daily_stats_card(stats):
-    icon_filename = get_weather_icon(stats)
-    encoded_image = load_svg_icon(icon_filename)
-
+def create_daily_stats_card(index):
+    name = f"daily-{index}"
     return dbc.Card(
         dbc.CardBody(
             [
-                html.H5(stats["day"], className="card-title"),
-                html.P(stats["date"], className="card-date", style={"margin": "0"}),
+                html.H5(PLACEHOLDER, id=value_id(f"{name}-day"), className="card-title"),
+                html.P(
+                    PLACEHOLDER,
+                    id=value_id(f"{name}-date"),
+                    className="card-date",
+                    style={"margin": "0"},
+                ),
                 html.Img(
-                    src=f"data:image/svg+xml;base64,{encoded_image}",
+                    id=icon_id(name),
+                    src=get_icon_url("wi-day-cloudy.svg"),
                     style={"height": "60px", "width": "60px", "margin": "9px"},
                 ),
                 html.P(
-                    f"{stats['max_temp']:.2f} °C",
+                    PLACEHOLDER,
+                    id=value_id(f"{name}-max"),
                     style={"fontSize": "24px", "fontWeight": "bold", "margin": "0"},
                 ),
-                html.P(f"{stats['min_temp']:.2f} °C", style={"margin": "0"}),
-                html.P(f"{stats['sum_rain']:.2f} mm", style={"margin": "0"}),
+                html.P(PLACEHOLDER, id=value_id(f"{name}-min"), style={"margin": "0"}),
+                html.P(PLACEHOLDER, id=value_id(f"{name}-rain"), style={"margin": "0"}),
             ],
             style={"textAlign": "center"},
         ),
@@ -295,35 +332,50 @@ def create_daily_stats_card(stats):
     )
 
 
-def create_daily_stats_row(df):
-    daily_stats = calculate_daily_stats(df)
-    return dbc.Row([dbc.Col(create_daily_stats_card(stats)) for stats in daily_stats])
+def create_daily_stats_row():
+    return dbc.Row(
+        [dbc.Col(create_daily_stats_card(index)) for index in range(DAILY_STATS_DAYS)]
+    )
 
 
-def create_main_content(df):
+def load_daily_stats():
+    # The last completed days, oldest first; days without data are skipped
+    today = datetime.now().date()
+    days = [today - timedelta(days=i) for i in range(DAILY_STATS_DAYS, 0, -1)]
+    daily_stats = get_daily_stats(days, sensebox_id=SENSEBOX_ID)
+    for stats in daily_stats:
+        stats["date"] = stats["day"].strftime("%d.%m")
+        stats["day"] = stats["day"].strftime("%A")[:3]
+    return daily_stats
+
+
+def daily_stats_values(daily_stats):
+    # The most recent day is shown in the last card; days without data keep
+    # the placeholder
+    values, icons = {}, {}
+    offset = DAILY_STATS_DAYS - len(daily_stats)
+    for index in range(DAILY_STATS_DAYS):
+        name = f"daily-{index}"
+        if index < offset:
+            for field in ("day", "date", "max", "min", "rain"):
+                values[f"{name}-{field}"] = PLACEHOLDER
+            icons[name] = get_icon_url("wi-day-cloudy.svg")
+            continue
+        stats = daily_stats[index - offset]
+        values[f"{name}-day"] = stats["day"]
+        values[f"{name}-date"] = stats["date"]
+        values[f"{name}-max"] = f"{stats['max_temp']:.2f} °C"
+        values[f"{name}-min"] = f"{stats['min_temp']:.2f} °C"
+        values[f"{name}-rain"] = f"{stats['sum_rain']:.2f} mm"
+        icons[name] = get_icon_url(get_weather_icon(stats))
+    return values, icons
+
+
+def create_main_content():
     return dbc.Card(
         dbc.CardBody(
-            [
-                create_daily_stats_row(df),
-                create_sensor_cards_row(
-                    df,
-                    [
-                        "Temperature in °C",
-                        "Humidity in %",
-                        "Windspeed in m/s",
-                        "UV-B Radiation in W/m2",
-                    ],
-                ),
-                create_sensor_cards_row(
-                    df,
-                    [
-                        "Pressure in hPa",
-                        "Rain (1h) in mm",
-                        "Wind Direction in °",
-                        "UV-A Radiation in W/m2",
-                    ],
-                ),
-            ],
+            [create_daily_stats_row()]
+            + [create_sensor_cards_row(sensors) for sensors in KPI_ROWS],
             style={"padding": "15px", "padding-bottom": "0px"},
         ),
         className="mb-3",
@@ -334,14 +386,30 @@ def create_main_content(df):
     )
 
 
-def create_sensor_cards_row(df, sensors):
+def create_sensor_cards_row(sensors):
     cards = []
     for sensor in sensors:
-        value = f"{get_last_valid_value(df, sensor):.2f} {get_unit(sensor)}"
-        cards.append(dbc.Col(create_sensor_card(sensor, value, get_icon(sensor))))
+        cards.append(
+            dbc.Col(
+                create_sensor_card(
+                    sensor, PLACEHOLDER, get_icon(sensor), f"kpi-{sensor}"
+                )
+            )
+        )
     return dbc.Row(cards)
 
 
+def kpi_values(latest_values):
+    values = {}
+    for sensors in KPI_ROWS:
+        for sensor in sensors:
+            value = latest_values.get(sensor)
+            values[f"kpi-{sensor}"] = (
+                f"{value:.2f} {get_unit(sensor)}" if value is not None else PLACEHOLDER
+            )
+    return values
+
+
 def get_unit(sensor):
     units = {
         "Temperature in °C": "°C",
@@ -370,18 +438,85 @@ def get_icon(sensor):
     return icons.get(sensor, "wi-thermometer.svg")
 
 
-# Fetch and prepare data
-df = fetch_and_prepare_data()
-sensebox_info = fetch_sensebox_info().iloc[0]
-lon, lat = float(sensebox_info["longitude"]), float(sensebox_info["latitude"])
-sunrise_time, sunset_time = calculate_sun_times(lat, lon)
+def load_sensebox_info():
+    sensebox_info = fetch_sensebox_info(SENSEBOX_ID).iloc[0]
+    _sensebox["info"] = sensebox_info
+    _sensebox["location"] = (
+        float(sensebox_info["latitude"]),
+        float(sensebox_info["longitude"]),
+    )
+    return sensebox_info
+
+
+def get_sensebox_location():
+    if "location" not in _sensebox:
+        load_sensebox_info()
+    return _sensebox["location"]
+
+
+def warm_up():
+    # Load the sensebox info and the latest readings in the background, so the
+    # first callbacks are served from memory
+    timings = _startup["timings"]
+    try:
+        started = time.perf_counter()
+        load_sensebox_info()
+        timings["sensebox_info"] = time.perf_counter() - started
+        started = time.perf_counter()
+        fetch_latest_values(
+            get_data_version(fetch_data_version(SENSEBOX_ID)), SENSEBOX_ID
+        )
+        timings["latest_values"] = time.perf_counter() - started
+        _startup["ready"] = True
+        _startup["error"] = None
+    except Exception as e:
+        _startup["error"] = str(e)
+        print(f"Warm-up failed: {e}")
+
+
+@app.server.before_request
+def start_warm_up():
+    if _startup["ready"]:
+        return
+    with _warmup_lock:
+        thread = _startup.get("warm_up_thread")
+        if thread is not None and thread.is_alive():
+            return
+        last_attempt = _startup["last_attempt"]
+        if (
+            last_attempt is not None
+            and time.monotonic() - last_attempt < WARM_UP_RETRY_SECONDS
+        ):
+            return
+        _startup["last_attempt"] = time.monotonic()
+        _startup["warm_up_thread"] = threading.Thread(target=warm_up, daemon=True)
+        _startup["warm_up_thread"].start()
+
+
+@app.server.route("/ready")
+def ready():
+    status = {
+        "ready": _startup["ready"],
+        "error": _startup["error"],
+        "timings": {name: round(value, 3) for name, value in _startup["timings"].items()},
+    }
+    return jsonify(status), 200 if _startup["ready"] else 503
+
 
-# Initialize the forecast_df at the start
-forecast_df = train_and_predict(df)
+@app.server.route("/stats")
+def stats():
+    # Connection pool counters and the last ingest run per box; the box timings
+    # are only filled in the process that runs the scheduler
+    from scheduler import get_box_timings
+
+    box_timings = get_box_timings()
+    for timing in box_timings.values():
+        timing["finished_at"] = timing["finished_at"].isoformat()
+        timing["duration"] = round(timing["duration"], 3)
+    return jsonify({"pool": pool_stats(), "boxes": box_timings})
 
 
 def create_forecast_card(time, value, icon_filename):
-    encoded_image = load_svg_icon(icon_filename)
     return dbc.Card(
         dbc.CardBody(
             [
@@ -395,7 +530,7 @@ def create_forecast_card(time, value, icon_filename):
                     },
                 ),
                 html.Img(
-                    src=f"data:image/svg+xml;base64,{encoded_image}",
+                    src=get_icon_url(icon_filename),
                     className="card-icon",
                     style={"height": "60px", "width": "60px"},
                 ),
@@ -465,11 +600,6 @@ aggregation_options = [
     ]
 ]
 
-try:
-    encoded_map_icon = load_svg_icon("map.svg")
-except FileNotFoundError as e:
-    print(e)  # Print the error to see the problematic path
-
 # Define the layout of the app
 app.layout = html.Div(
     style={
@@ -484,6 +614,9 @@ app.layout = html.Div(
             interval=60 * 1000,  # in milliseconds
             n_intervals=0,
         ),
+        # Data version and forecast run_id currently rendered in this browser
+        dcc.Store(id="data-version"),
+        dcc.Store(id="forecast-run-id"),
         html.Div(
             style={"maxWidth": "100%", "width": "100%"},
             children=[
@@ -509,7 +642,7 @@ app.layout = html.Div(
                         dbc.Col(
                             html.Img(
                                 id="open-modal",
-                                src=f"data:image/svg+xml;base64,{encoded_map_icon}",
+                                src=get_icon_url("map.svg"),
                                 style={
                                     "height": "40px",
                                     "width": "40px",
@@ -523,14 +656,13 @@ app.layout = html.Div(
                 dbc.Row(
                     style={"display": "flex", "justifyContent": "center"},
                     children=[
+                        # The values are filled in by update_dashboard
                         dbc.Col(
-                            create_sensebox_info_card(
-                                sensebox_info, sunrise_time, sunset_time
-                            ),
+                            create_sensebox_info_card(),
                             id="sensebox-info-card",
                             width=3,
                         ),
-                        dbc.Col(create_main_content(df), id="main-content", width=9),
+                        dbc.Col(create_main_content(), id="main-content", width=9),
                     ],
                 ),
                 dbc.Card(
@@ -623,32 +755,86 @@ app.layout = html.Div(
 )
 
 
+def get_data_version(watermark):
+    # Advances with every ingested measurement and at midnight (daily cards,
+    # sunrise and sunset)
+    return f"{watermark}|{datetime.now():%Y-%m-%d}"
+
+
+def changed_values(outputs, values, current):
+    # no_update for every value the browser already shows
+    updates = []
+    for output, shown in zip(outputs, current):
+        value = values[output["id"]["name"]]
+        updates.append(dash.no_update if value == shown else value)
+    return updates
+
+
 @app.callback(
-    [Output("sensebox-info-card", "children"), Output("main-content", "children")],
+    [
+        Output(value_id(ALL), "children"),
+        Output(icon_id(ALL), "src"),
+        Output("data-version", "data"),
+    ],
     [Input("interval-component", "n_intervals")],
+    [
+        State(value_id(ALL), "children"),
+        State(icon_id(ALL), "src"),
+        State("data-version", "data"),
+    ],
 )
-def update_dashboard(n_intervals):
+def update_dashboard(n_intervals, shown_values, shown_icons, rendered_version):
+    watermark = fetch_data_version(SENSEBOX_ID)
+    version = get_data_version(watermark)
+    if version == rendered_version:
+        # A bare no_update is not a valid value for the ALL outputs
+        raise PreventUpdate
+
     # Fetch updated data
-    df = fetch_and_prepare_data()
-    sensebox_info = fetch_sensebox_info().iloc[0]
-    lon, lat = float(sensebox_info["longitude"]), float(sensebox_info["latitude"])
+    latest_values = fetch_latest_values(version, SENSEBOX_ID)
+    sensebox_info = load_sensebox_info()
+    lat, lon = get_sensebox_location()
     sunrise_time, sunset_time = calculate_sun_times(lat, lon)
 
-    # Create updated components
-    sensebox_info_card = create_sensebox_info_card(
-        sensebox_info, sunrise_time, sunset_time
-    )
-    main_content = create_main_content(df)
+    values = sensebox_info_values(sensebox_info, sunrise_time, sunset_time)
+    values.update(kpi_values(latest_values))
+    daily_values, daily_icons = daily_stats_values(load_daily_stats())
+    values.update(daily_values)
 
-    return sensebox_info_card, main_content
+    outputs = dash.callback_context.outputs_list
+    return (
+        changed_values(outputs[0], values, shown_values),
+        changed_values(outputs[1], daily_icons, shown_icons),
+        version,
+    )
 
 
 @app.callback(
-    [Output("forecast-line-plot", "figure"), Output("forecast-row", "children")],
+    [
+        Output("forecast-line-plot", "figure"),
+        Output("forecast-row", "children"),
+        Output("forecast-run-id", "data"),
+    ],
     [Input("interval-component", "n_intervals")],
+    [State("forecast-run-id", "data")],
 )
-def update_forecast_components(n_intervals):
-    global forecast_df
+def update_forecast_components(n_intervals, rendered_run_id):
+    # The forecast is trained in the worker process; here only the latest
+    # published run is read, and only re-rendered when its run_id changes
+    latest_run = fetch_latest_forecast_run()
+    if latest_run is None:
+        if rendered_run_id == 0:
+            return dash.no_update, dash.no_update, dash.no_update
+        fig = px.line(title="Die Vorhersage wird berechnet...").update_layout(
+            paper_bgcolor="#e7e9f5",
+            plot_bgcolor="#e7e9f5",
+        )
+        return fig, dbc.Row(), 0
+
+    run_id = latest_run[0]
+    if run_id == rendered_run_id:
+        return dash.no_update, dash.no_update, dash.no_update
+    forecast_df = fetch_forecast(run_id)
 
     fig = px.line(
         forecast_df.iloc[1:],  # Skip the first value for the line plot
@@ -667,7 +853,7 @@ def update_forecast_components(n_intervals):
 
     forecast_row = create_forecast_row(forecast_df)
 
-    return fig, forecast_row
+    return fig, forecast_row, run_id
 
 
 @app.callback(
@@ -684,19 +870,20 @@ def update_line_plot(sensor, aggregation):
             plot_bgcolor="#e7e9f5",
         )
 
-    df_resampled = df.resample(aggregation, on="created_at")
+    # Read the pre-aggregated buckets instead of resampling the raw history
+    df_rollup = fetch_rollup(sensor, aggregation, SENSEBOX_ID)
     if sensor in ["Temperature in °C", "Humidity in %", "Pressure in hPa"]:
-        df_agg = df_resampled.agg({sensor: ["min", "mean", "max"]})
+        stats = ["min", "mean", "max"]
         colors = {"min": "#70A1D7", "mean": "#A1DE93", "max": "#F47C7C"}
     elif sensor == "Rain (1h) in mm":
-        df_agg = df_resampled.agg({sensor: "sum"})
+        stats = ["sum"]
         colors = {"sum": "#70A1D7"}
     else:
-        df_agg = df_resampled.agg({sensor: ["mean", "max"]})
+        stats = ["mean", "max"]
         colors = {"mean": "#A1DE93", "max": "#F47C7C"}
 
-    df_agg.columns = ["_".join(col).strip() for col in df_agg.columns.values]
-    df_agg.reset_index(inplace=True)
+    df_agg = df_rollup[["created_at"] + stats]
+    df_agg.columns = ["created_at"] + [f"{sensor}_{stat}" for stat in stats]
 
     fig = px.line(
         df_agg,
@@ -734,6 +921,7 @@ def display_choropleth_map(n_clicks):
     if n_clicks is None:
         return {}
 
+    lat, lon = get_sensebox_location()
     df_sample = pd.DataFrame(
         {
             "lat": [lat, lat + 0.01, lat - 0.01],
@@ -765,12 +953,23 @@ def display_choropleth_map(n_clicks):
     return fig
 
 
+_startup["timings"]["import"] = time.perf_counter() - _import_started
+
+
+# Everything that touches the database or starts threads runs only when the app
+# is started as a server: the spawn workers of the forecast re-import this
+# module as __mp_main__ and must not repeat it
 if __name__ == "__main__":
+    # Ingest and scheduler are only needed when the app runs as a server
+    from initialize import update_data
+    from scheduler import start_scheduler
+
+    start_warm_up()
 
     scheduler_thread = threading.Thread(target=start_scheduler)
     scheduler_thread.start()
 
-    update_data()  # Erstes Daten-Update beim Start
-    train_and_update_forecast()  # Erstes Modelltraining beim Start
+    # Erstes Daten-Update beim Start im Hintergrund, der Server startet sofort
+    threading.Thread(target=update_data, daemon=True).start()
 
     app.run_server(debug=False)
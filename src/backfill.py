@@ -0,0 +1,211 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+from db import connection
+from initialize import (
+    DEFAULT_SENSEBOX_ID,
+    PIPELINE_CONFIG,
+    get_sensor_titles_and_ids,
+    insert_measurement_data,
+    parse_sensor_stream,
+    refresh_rollups,
+    retention_cutoff,
+    setup_database,
+    stream_sensor_data,
+    update_last_measurement_at,
+)
+from pipeline import run_pipeline
+
+# Einstellungen des historischen Backfills
+# start: Beginn der Historie (UTC), window_days: Länge eines Zeitfensters,
+# workers: Anzahl parallel geladener Zeitfenster
+BACKFILL_CONFIG = {
+    "sensebox_id": DEFAULT_SENSEBOX_ID,
+    "start": datetime(2022, 1, 1),
+    "window_days": 30,
+    "workers": 8,
+}
+
+
+# Funktion zum Erstellen der Checkpoint-Tabelle für abgeschlossene Zeitfenster
+def create_checkpoint_table(cur):
+    create_checkpoint_query = """
+    CREATE TABLE IF NOT EXISTS backfill_checkpoint (
+        sensor_id VARCHAR(50),
+        window_start TIMESTAMP,
+        window_end TIMESTAMP,
+        rows_inserted INTEGER,
+        completed_at TIMESTAMP DEFAULT now(),
+        PRIMARY KEY (sensor_id, window_start),
+        FOREIGN KEY (sensor_id) REFERENCES sensor(sensor_id)
+    );
+    """
+    cur.execute(create_checkpoint_query)
+
+
+# Funktion zum Aufteilen der Historie in Zeitfenster fester Länge
+# Das letzte Fenster endet bei "end"; Messwerte, die danach eintreffen, lädt
+# update_data ab der Watermark
+def build_windows(start, end, window_days):
+    windows = []
+    window = timedelta(days=window_days)
+    window_start = start
+    while window_start < end:
+        windows.append((window_start, min(window_start + window, end)))
+        window_start += window
+    return windows
+
+
+# Funktion zum Abrufen der bereits abgeschlossenen Zeitfenster
+def get_completed_windows(cur, sensor_ids):
+    cur.execute(
+        "SELECT sensor_id, window_start FROM backfill_checkpoint WHERE sensor_id = ANY(%s);",
+        (sensor_ids,),
+    )
+    return set(cur.fetchall())
+
+
+# Funktion zum Prüfen, ob eine senseBox Sensoren hat, die weder eine Watermark
+# noch ein abgeschlossenes Zeitfenster haben, deren Historie also fehlt
+def needs_backfill(cur, sensebox_id):
+    cur.execute("SELECT to_regclass('public.backfill_checkpoint') IS NOT NULL;")
+    has_checkpoints = cur.fetchone()[0]
+    checkpoint_condition = (
+        "AND NOT EXISTS (SELECT 1 FROM backfill_checkpoint c WHERE c.sensor_id = s.sensor_id)"
+        if has_checkpoints
+        else ""
+    )
+    cur.execute(
+        f"""
+        SELECT EXISTS (
+            SELECT 1 FROM sensor s
+            LEFT JOIN ingest_watermark w ON w.sensor_id = s.sensor_id
+            WHERE s.sensebox_id = %s AND w.sensor_id IS NULL
+            {checkpoint_condition}
+        );
+        """,
+        (sensebox_id,),
+    )
+    return cur.fetchone()[0]
+
+
+def format_api_date(date):
+    return date.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+# Hauptprogramm: lädt alle noch offenen Zeitfenster parallel und vermerkt jedes
+# vollständig geschriebene Fenster in backfill_checkpoint. Ein abgebrochener
+# Lauf setzt beim erneuten Start mit den offenen Fenstern fort.
+def main(sensebox_id=None, start=None, window_days=None, workers=None):
+    sensebox_id = sensebox_id or BACKFILL_CONFIG["sensebox_id"]
+    start = start or BACKFILL_CONFIG["start"]
+    # Monate vor dem Aufbewahrungszeitraum würde der nächtliche Job wieder löschen
+    cutoff = retention_cutoff()
+    if cutoff is not None:
+        start = max(start, cutoff)
+    window_days = window_days or BACKFILL_CONFIG["window_days"]
+    workers = workers or BACKFILL_CONFIG["workers"]
+
+    # Schema anlegen und die senseBox registrieren, ohne Messdaten zu laden
+    setup_database([sensebox_id])
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    windows = build_windows(start, now, window_days)
+    sensors = get_sensor_titles_and_ids(sensebox_id)
+
+    with connection() as conn:
+        cur = conn.cursor()
+        create_checkpoint_table(cur)
+        conn.commit()
+
+        completed = get_completed_windows(cur, [sensor["id"] for sensor in sensors])
+        pending = [
+            (sensor, window_start, window_end)
+            for window_start, window_end in windows
+            for sensor in sensors
+            if (sensor["id"], window_start) not in completed
+        ]
+        print(
+            f"Backfill: {len(pending)} von {len(windows) * len(sensors)} Zeitfenstern offen."
+        )
+
+        progress = {}
+        totals = {"inserted": 0, "windows": 0}
+
+        def fetch(item):
+            sensor, window_start, window_end = item
+            return stream_sensor_data(
+                sensebox_id,
+                sensor["title"],
+                format_api_date(window_start),
+                format_api_date(window_end),
+            )
+
+        def parse(item, response):
+            return parse_sensor_stream(item[0], response)
+
+        def write(item, df):
+            inserted, skipped, earliest, latest = insert_measurement_data(
+                cur, item[0], df
+            )
+            if earliest is not None:
+                refresh_rollups(
+                    cur, since=earliest, until=latest, sensor_ids=[item[0]["id"]]
+                )
+            conn.commit()
+            key = (item[0]["id"], item[1])
+            progress[key] = progress.get(key, 0) + inserted
+            totals["inserted"] += inserted
+
+        def on_item_done(item):
+            sensor, window_start, window_end = item
+            cur.execute(
+                """
+                INSERT INTO backfill_checkpoint (sensor_id, window_start, window_end, rows_inserted)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (sensor_id, window_start) DO NOTHING;
+                """,
+                (
+                    sensor["id"],
+                    window_start,
+                    window_end,
+                    progress.pop((sensor["id"], window_start), 0),
+                ),
+            )
+            conn.commit()
+            totals["windows"] += 1
+
+        run_pipeline(
+            pending,
+            fetch,
+            parse,
+            write,
+            fetch_workers=workers,
+            parse_workers=workers,
+            queue_size=PIPELINE_CONFIG["queue_size"],
+            on_item_done=on_item_done,
+        )
+
+        if totals["inserted"]:
+            update_last_measurement_at(cur, [sensebox_id])
+        cur.close()
+
+    print(
+        f"Backfill: {totals['windows']} Zeitfenster abgeschlossen, {totals['inserted']} Messwerte eingefügt."
+    )
+    if totals["windows"] < len(pending):
+        print("Backfill unvollständig, erneuter Start setzt bei den offenen Zeitfenstern fort.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Historischer Backfill der Messdaten")
+    parser.add_argument("--sensebox-id", default=BACKFILL_CONFIG["sensebox_id"])
+    parser.add_argument(
+        "--start",
+        type=datetime.fromisoformat,
+        default=BACKFILL_CONFIG["start"],
+        help="Beginn der Historie in UTC, z.B. 2022-01-01",
+    )
+    parser.add_argument("--window-days", type=int, default=BACKFILL_CONFIG["window_days"])
+    parser.add_argument("--workers", type=int, default=BACKFILL_CONFIG["workers"])
+    args = parser.parse_args()
+    main(args.sensebox_id, args.start, args.window_days, args.workers)
@@ -0,0 +1,248 @@
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from fetch import fetch_sensor_frame
+from forecasters import FORECASTERS, create_forecaster
+from utils import FORECAST_CONFIG, FORECAST_SENSORS, init_forecast_worker
+
+warnings.filterwarnings("ignore", category=FutureWarning)
+warnings.filterwarnings("ignore", category=UserWarning)
+
+# Einstellungen des Backtests
+# step_hours: Abstand der Prognosezeitpunkte (rolling origin)
+# folds: Anzahl der jüngsten Prognosezeitpunkte (None = gesamte Historie)
+# min_train_hours: Mindestlänge der Trainingsdaten vor dem ersten Zeitpunkt
+# training_weeks: Trainingsfenster je Fold (None = gesamte Historie bis dahin)
+# measure_memory: zusätzlich die Python-Speicherspitze je Fold in einem zweiten
+# Durchlauf mit tracemalloc messen (die RSS-Spitze des Prozesses wird immer erfasst)
+BACKTEST_CONFIG = {
+    "sensor": "Temperature in °C",
+    "engine": FORECAST_CONFIG["engine"],
+    "step_hours": 24,
+    "folds": None,
+    "min_train_hours": 7 * 24,
+    "training_weeks": FORECAST_CONFIG["training_weeks"],
+    "workers": 4,
+    "measure_memory": False,
+}
+
+
+# Funktion zum Laden der gesamten stündlichen Historie eines Sensors
+def load_hourly_history(sensor):
+    df = fetch_sensor_frame(
+        sensors=[sensor],
+        bucket="H",
+        agg=FORECAST_SENSORS.get(sensor, "avg"),
+        sensebox_id=FORECAST_CONFIG["sensebox_id"],
+    )
+    df = df.dropna()
+    df.columns = ["ds", "y"]
+    df["y"] = df["y"].astype(float)
+    return df.reset_index(drop=True)
+
+
+# Funktion zum Bestimmen der Prognosezeitpunkte, vom jüngsten Zeitpunkt mit
+# vollständigem Holdout im Abstand von step_hours rückwärts
+def build_origins(history, periods, step_hours, folds, min_train_hours):
+    first = history["ds"].iloc[0] + timedelta(hours=min_train_hours)
+    origin = history["ds"].iloc[-1] - timedelta(hours=periods - 1)
+    origins = []
+    while origin >= first and (folds is None or len(origins) < folds):
+        origins.append(origin)
+        origin -= timedelta(hours=step_hours)
+    return sorted(origins)
+
+
+def fit_and_predict(engine, train, periods):
+    options = {"checkpoint": False} if engine == "neuralprophet" else {}
+    forecaster = create_forecaster(engine, FORECAST_CONFIG, **options).fit(train)
+    return forecaster.predict(periods)
+
+
+# Funktion für einen Fold: Training bis zum Prognosezeitpunkt, Fehler je
+# Horizontschritt; läuft in einem Prozess des Pools. Die RSS-Spitze des
+# Prozesses (ru_maxrss, in KiB) kostet keinen eigenen Durchlauf; sie gilt für
+# die bisherige Lebensdauer des Prozesses, also alle Folds, die er bis dahin
+# gerechnet hat. Die Zeit wird ohne tracemalloc gemessen, das jede Allokation
+# verlangsamt; die Python-Speicherspitze optional in einem eigenen Durchlauf
+def run_fold(engine, origin, train, actual, periods, measure_memory=False):
+    started = time.perf_counter()
+    forecast = fit_and_predict(engine, train, periods)
+    wall_time = time.perf_counter() - started
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    traced_peak = None
+    if measure_memory:
+        tracemalloc.start()
+        fit_and_predict(engine, train, periods)
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    shutil.rmtree("lightning_logs", ignore_errors=True)
+
+    scored = forecast.merge(actual, on="ds", how="left", suffixes=("hat", ""))
+    steps = ((scored["ds"] - origin) / timedelta(hours=1)).astype(int) + 1
+    return {
+        "origin": origin,
+        "wall_time": wall_time,
+        "pid": os.getpid(),
+        "peak_rss": peak_rss,
+        "traced_peak": traced_peak,
+        "errors": pd.Series(
+            (scored["y"] - scored["yhat"]).to_numpy(), index=steps.to_numpy()
+        ),
+    }
+
+
+def summarize_errors(folds):
+    errors = pd.concat(
+        [fold["errors"].rename(str(fold["origin"])) for fold in folds], axis=1
+    )
+    summary = pd.DataFrame(
+        {
+            "MAE": errors.abs().mean(axis=1),
+            "RMSE": np.sqrt((errors**2).mean(axis=1)),
+            "Folds": errors.count(axis=1),
+        }
+    )
+    summary.index.name = "Schritt [h]"
+    return summary
+
+
+def main(
+    sensor=None,
+    engine=None,
+    folds=None,
+    step_hours=None,
+    workers=None,
+    output=None,
+    measure_memory=None,
+):
+    sensor = sensor or BACKTEST_CONFIG["sensor"]
+    engine = engine or BACKTEST_CONFIG["engine"]
+    folds = folds or BACKTEST_CONFIG["folds"]
+    step_hours = step_hours or BACKTEST_CONFIG["step_hours"]
+    workers = workers or BACKTEST_CONFIG["workers"]
+    if measure_memory is None:
+        measure_memory = BACKTEST_CONFIG["measure_memory"]
+    periods = FORECAST_CONFIG["periods"]
+
+    history = load_hourly_history(sensor)
+    origins = build_origins(
+        history, periods, step_hours, folds, BACKTEST_CONFIG["min_train_hours"]
+    )
+    if not origins:
+        print(f"Zu wenig Historie für einen Backtest von {sensor}.")
+        return
+    print(
+        f"Backtest {engine} / {sensor}: {len(history)} Stundenwerte, "
+        f"{len(origins)} Folds, {periods}h Horizont, {workers} Prozesse"
+    )
+
+    cpus = os.cpu_count() or 1
+    workers = min(workers, cpus, len(origins))
+    started = time.perf_counter()
+    results = []
+    # "spawn", damit die Prozesse keine Datenbankverbindungen erben; je Fold
+    # werden nur Trainingsfenster und Holdout übertragen
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_forecast_worker,
+        initargs=(max(1, cpus // workers), engine),
+    ) as executor:
+        futures = []
+        for origin in origins:
+            train = history[history["ds"] < origin]
+            if BACKTEST_CONFIG["training_weeks"] is not None:
+                train = train[
+                    train["ds"]
+                    >= origin - timedelta(weeks=BACKTEST_CONFIG["training_weeks"])
+                ]
+            actual = history[
+                (history["ds"] >= origin)
+                & (history["ds"] < origin + timedelta(hours=periods))
+            ]
+            futures.append(
+                executor.submit(
+                    run_fold, engine, origin, train, actual, periods, measure_memory
+                )
+            )
+        for future in as_completed(futures):
+            try:
+                fold = future.result()
+            except Exception as e:
+                print(f"Fold fehlgeschlagen: {e}")
+                continue
+            results.append(fold)
+            memory = f"  Peak RSS {fold['peak_rss'] / 1e6:>7.1f} MB (PID {fold['pid']})"
+            if fold["traced_peak"] is not None:
+                memory += f"  Peak Py {fold['traced_peak'] / 1e6:>7.1f} MB"
+            print(
+                f"{fold['origin']:%Y-%m-%d %H:%M}  {fold['wall_time']:>8.2f} s"
+                f"{memory}  MAE {fold['errors'].abs().mean():>6.2f}"
+            )
+    total_time = time.perf_counter() - started
+    if not results:
+        return
+
+    results.sort(key=lambda fold: fold["origin"])
+    summary = summarize_errors(results)
+    print()
+    print(summary.round(3).to_string())
+    wall_times = [fold["wall_time"] for fold in results]
+    print(
+        f"\nGesamt: {total_time:.1f} s für {len(results)} Folds, "
+        f"{np.mean(wall_times):.2f} s je Fold (max {np.max(wall_times):.2f} s), "
+        f"Peak RSS je Prozess max {max(fold['peak_rss'] for fold in results) / 1e6:.1f} MB"
+    )
+
+    if output:
+        pd.DataFrame(
+            {
+                "origin": [fold["origin"] for fold in results],
+                "wall_time": wall_times,
+                "pid": [fold["pid"] for fold in results],
+                "peak_rss": [fold["peak_rss"] for fold in results],
+                "traced_peak": [fold["traced_peak"] for fold in results],
+                "mae": [fold["errors"].abs().mean() for fold in results],
+                "rmse": [np.sqrt((fold["errors"] ** 2).mean()) for fold in results],
+            }
+        ).to_csv(output, index=False)
+        print(f"Folds gespeichert in {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rolling-origin-Backtest der Prognose über die gespeicherte Historie"
+    )
+    parser.add_argument("--sensor")
+    parser.add_argument("--engine", choices=sorted(FORECASTERS))
+    parser.add_argument("--folds", type=int)
+    parser.add_argument("--step-hours", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--output", help="CSV-Datei für die Ergebnisse je Fold")
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        default=None,
+        help="Python-Speicherspitze je Fold zusätzlich in einem zweiten Durchlauf messen",
+    )
+    args = parser.parse_args()
+    main(
+        args.sensor,
+        args.engine,
+        args.folds,
+        args.step_hours,
+        args.workers,
+        args.output,
+        args.memory,
+    )
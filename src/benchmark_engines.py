@@ -0,0 +1,109 @@
+import argparse
+import multiprocessing
+import resource
+import shutil
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+import numpy as np
+from forecasters import FORECASTERS, create_forecaster
+from utils import FORECAST_CONFIG, fetch_training_data, prepare_hourly_series
+
+warnings.filterwarnings("ignore", category=FutureWarning)
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def create_engine(name):
+    options = {"checkpoint": False} if name == "neuralprophet" else {}
+    return create_forecaster(name, FORECAST_CONFIG, **options)
+
+
+# Funktion zum Messen einer Engine über alle Prognosezeitpunkte; läuft in einem
+# eigenen Prozess, damit der Spitzenwert des Speichers (ru_maxrss) nur diese
+# Engine erfasst. Die Zeiten werden ohne tracemalloc gemessen, das jede
+# Allokation verlangsamt; die Python-Speicherspitze in einem zweiten Durchlauf
+def run_engine(name, history, origins, periods):
+    folds = []
+    for origin in origins:
+        train = history[history["ds"] < origin]
+        actual = history[
+            (history["ds"] >= origin)
+            & (history["ds"] < origin + timedelta(hours=periods))
+        ]
+        folds.append((train, actual))
+
+    fit_times, predict_times, errors = [], [], []
+    for train, actual in folds:
+        forecaster = create_engine(name)
+
+        started = time.perf_counter()
+        forecaster.fit(train)
+        fit_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        forecast = forecaster.predict(periods)
+        predict_times.append(time.perf_counter() - started)
+
+        scored = actual.merge(forecast, on="ds", suffixes=("", "hat"))
+        errors.extend(scored["y"] - scored["yhat"])
+    # Vor dem Speicher-Durchlauf lesen, tracemalloc belegt selbst Speicher
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    tracemalloc.start()
+    for train, actual in folds:
+        create_engine(name).fit(train).predict(periods)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    shutil.rmtree("lightning_logs", ignore_errors=True)
+
+    errors = np.asarray(errors)
+    return {
+        "fit": np.mean(fit_times),
+        "predict": np.mean(predict_times),
+        "traced_peak": traced_peak,
+        "max_rss": max_rss,
+        "mae": np.abs(errors).mean(),
+        "rmse": np.sqrt((errors**2).mean()),
+    }
+
+
+def main(origins=3, engines=None):
+    engines = engines or list(FORECASTERS)
+    periods = FORECAST_CONFIG["periods"]
+    # Gespeicherte Historie innerhalb des Trainingsfensters, wie im Betrieb
+    history = prepare_hourly_series(fetch_training_data(["Temperature in °C"]))
+    history = history.reset_index(drop=True)
+    last = history["ds"].iloc[-1]
+    origin_times = [
+        last - timedelta(hours=periods - 1) - timedelta(days=i) for i in range(origins)
+    ]
+    print(f"{len(history)} Stundenwerte, {origins} Prognosezeitpunkte, {periods}h Horizont")
+    print(
+        f"{'Engine':<16}{'Fit [s]':>10}{'Predict [s]':>13}{'Peak Py [MB]':>14}"
+        f"{'Max RSS [MB]':>14}{'MAE':>8}{'RMSE':>8}"
+    )
+
+    for name in engines:
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            result = executor.submit(
+                run_engine, name, history, origin_times, periods
+            ).result()
+        print(
+            f"{name:<16}{result['fit']:>10.3f}{result['predict']:>13.4f}"
+            f"{result['traced_peak'] / 1e6:>14.1f}{result['max_rss'] / 1e6:>14.1f}"
+            f"{result['mae']:>8.2f}{result['rmse']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Vergleich der Prognose-Engines: Latenz, Speicher und Genauigkeit"
+    )
+    parser.add_argument("--origins", type=int, default=3)
+    parser.add_argument("--engines", nargs="+", choices=sorted(FORECASTERS))
+    args = parser.parse_args()
+    main(args.origins, args.engines)
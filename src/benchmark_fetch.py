@@ -0,0 +1,105 @@
+import argparse
+import io
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from fetch import pivot_sensor_data
+
+# Sensoren der senseBox ("Titel in Einheit") für die synthetische Historie
+SENSORS = [
+    "Temperature in °C",
+    "Humidity in %",
+    "Pressure in hPa",
+    "Windspeed in m/s",
+    "Wind Direction in °",
+    "Rain (1h) in mm",
+    "UV-A Radiation in W/m2",
+    "UV-B Radiation in W/m2",
+]
+
+
+# Funktion zum Erzeugen einer synthetischen Historie mit einem Messwert je
+# Sensor und Minute; liefert die Zeitpunkte und Werte im Langformat
+def generate_history(days):
+    rng = np.random.default_rng(42)
+    minutes = days * 24 * 60
+    start = datetime(2022, 1, 1)
+    created_at = pd.date_range(start, periods=minutes, freq="min")
+    sensor_units = np.repeat(SENSORS, minutes)
+    timestamps = np.tile(created_at.to_pydatetime(), len(SENSORS))
+    values = np.round(rng.normal(20, 10, size=minutes * len(SENSORS)), 2)
+    return sensor_units, timestamps, values
+
+
+# Bisheriger Weg: psycopg2-Tupel (str, datetime, Decimal) -> DataFrame -> Pivot
+def decode_tuples(rows):
+    df = pd.DataFrame(rows, columns=["sensor_unit", "created_at", "value"])
+    df_pivot = df.pivot(index="created_at", columns="sensor_unit", values="value")
+    df_pivot.reset_index(inplace=True)
+    return df_pivot
+
+
+# Neuer Weg: COPY-CSV -> typisiertes DataFrame -> Pivot (wie fetch_measurement_frame)
+def decode_copy(csv_text, value_dtype):
+    df = pd.read_csv(
+        io.StringIO(csv_text),
+        dtype={"sensor_unit": "category", "value": value_dtype},
+    )
+    df["created_at"] = pd.to_datetime(df["created_at"], format="ISO8601")
+    return pivot_sensor_data(df)
+
+
+# Funktion zum Messen von Zeit und Speicherspitze; die Zeit wird ohne
+# tracemalloc gemessen, das jede Allokation verlangsamt, die Speicherspitze in
+# einem zweiten Durchlauf
+def measure(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    duration = time.perf_counter() - started
+
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, duration, peak
+
+
+def main(days=90):
+    sensor_units, timestamps, values = generate_history(days)
+    print(f"Synthetische Historie: {days} Tage, {len(values)} Messwerte")
+
+    # Eingaben so, wie sie der Datenbanktreiber liefert (nicht Teil der Messung)
+    rows = [
+        (sensor_unit, created_at, Decimal(f"{value:.2f}"))
+        for sensor_unit, created_at, value in zip(sensor_units, timestamps, values)
+    ]
+    csv_buffer = io.StringIO()
+    pd.DataFrame(
+        {"sensor_unit": sensor_units, "created_at": timestamps, "value": values}
+    ).to_csv(csv_buffer, index=False, float_format="%.2f")
+    csv_text = csv_buffer.getvalue()
+
+    candidates = [
+        ("Tupel/Decimal", decode_tuples, rows),
+        ("COPY float64", decode_copy, csv_text, "float64"),
+        ("COPY float32", decode_copy, csv_text, "float32"),
+    ]
+    print(f"{'Variante':<16}{'Zeit [s]':>10}{'Peak [MB]':>12}{'DataFrame [MB]':>16}")
+    for name, function, *args in candidates:
+        df, duration, peak = measure(function, *args)
+        frame_size = df.memory_usage(deep=True).sum()
+        print(
+            f"{name:<16}{duration:>10.2f}{peak / 1e6:>12.1f}{frame_size / 1e6:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Vergleich der Dekodierung des pivotierten Sensor-DataFrames"
+    )
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+    main(args.days)
@@ -0,0 +1,88 @@
+import argparse
+import shutil
+import time
+import warnings
+import numpy as np
+from datetime import timedelta
+from neuralprophet import NeuralProphet
+from fetch import fetch_sensor_frame
+from utils import FORECAST_CONFIG
+
+warnings.filterwarnings("ignore", category=FutureWarning)
+warnings.filterwarnings("ignore", category=UserWarning)
+
+# Zu vergleichende Fensterlängen in Wochen (None = gesamte Historie)
+WINDOWS = [1, 2, 4, 8, 16, 26, 52, None]
+
+
+# Funktion zum Laden der gesamten stündlichen Temperaturhistorie (Stundenmaxima)
+def load_hourly_history():
+    df = fetch_sensor_frame(
+        sensors=["Temperature in °C"],
+        bucket="H",
+        agg="max",
+        sensebox_id=FORECAST_CONFIG["sensebox_id"],
+    )
+    df = df.dropna()
+    df.columns = ["ds", "y"]
+    df["y"] = df["y"].astype(float)
+    return df.reset_index(drop=True)
+
+
+def fit_and_score(history, origin, weeks, periods, epochs):
+    # Training auf dem Fenster bis zum Prognosezeitpunkt, Bewertung der
+    # folgenden periods Stunden
+    train = history[history["ds"] < origin]
+    if weeks is not None:
+        train = train[train["ds"] >= origin - timedelta(weeks=weeks)]
+    actual = history[
+        (history["ds"] >= origin)
+        & (history["ds"] < origin + timedelta(hours=periods))
+    ]
+
+    m = NeuralProphet()
+    started = time.perf_counter()
+    m.fit(train, freq="H", epochs=epochs)
+    fit_time = time.perf_counter() - started
+
+    future = m.make_future_dataframe(train, periods=periods)
+    forecast = m.predict(future)[["ds", "yhat1"]]
+    scored = actual.merge(forecast, on="ds")
+    errors = scored["y"] - scored["yhat1"]
+    return len(train), fit_time, errors.abs().mean(), np.sqrt((errors**2).mean())
+
+
+def main(origins=3, epochs=None):
+    epochs = epochs or FORECAST_CONFIG["full_epochs"]
+    periods = FORECAST_CONFIG["periods"]
+    history = load_hourly_history()
+    last = history["ds"].iloc[-1]
+    # Prognosezeitpunkte im Abstand von einem Tag; der letzte lässt noch einen
+    # vollständigen Holdout übrig
+    origin_times = [
+        last - timedelta(hours=periods - 1) - timedelta(days=i) for i in range(origins)
+    ]
+    print(
+        f"{len(history)} Stundenwerte, {origins} Prognosezeitpunkte, {periods}h Horizont, {epochs} Epochen"
+    )
+    print(f"{'Fenster':>8}{'Zeilen':>8}{'Fit [s]':>10}{'MAE':>8}{'RMSE':>8}")
+
+    for weeks in WINDOWS:
+        results = [
+            fit_and_score(history, origin, weeks, periods, epochs)
+            for origin in origin_times
+        ]
+        rows, fit_time, mae, rmse = np.mean(results, axis=0)
+        label = f"{weeks}w" if weeks is not None else "alle"
+        print(f"{label:>8}{rows:>8.0f}{fit_time:>10.1f}{mae:>8.2f}{rmse:>8.2f}")
+        shutil.rmtree("lightning_logs", ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Trainingszeit und Holdout-Fehler der Prognose je Trainingsfenster"
+    )
+    parser.add_argument("--origins", type=int, default=3)
+    parser.add_argument("--epochs", type=int, default=None)
+    args = parser.parse_args()
+    main(args.origins, args.epochs)
@@ -0,0 +1,105 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+import requests
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Startet die App mit Warm-up, aber ohne Scheduler und Ingest, damit nur der
+# Start gemessen wird
+SERVER_COMMAND = (
+    "import app; app.start_warm_up(); app.app.run_server(port={port}, debug=False)"
+)
+
+
+# Funktion zum Messen der Importzeit von app.py; liefert die Gesamtzeit und
+# die kumulierten Importzeiten der Top-Level-Module aus "python -X importtime"
+def measure_import():
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=CURRENT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    duration = time.perf_counter() - started
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[12:].split("|"))
+        # Ohne Einrückung = direkt (nicht über ein anderes Modul) importiert
+        if not line.split("|")[2].startswith("  "):
+            modules[name] = int(cumulative) / 1e6
+    return duration, modules
+
+
+def wait_for(url, timeout, expected=200):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == expected:
+                return True
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.05)
+    return False
+
+
+# Funktion zum Messen der Zeit bis zur ersten Antwort, bis zum Layout und bis
+# zur Bereitschaft (/ready) nach dem Start des Servers
+def measure_first_response(port, timeout):
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVER_COMMAND.format(port=port)],
+        cwd=CURRENT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    milestones = {}
+    try:
+        for name, path in [
+            ("Erste Antwort (/)", "/"),
+            ("Layout (/_dash-layout)", "/_dash-layout"),
+            ("Bereit (/ready)", "/ready"),
+        ]:
+            if wait_for(base_url + path, timeout):
+                milestones[name] = time.perf_counter() - started
+            else:
+                milestones[name] = None
+        ready = requests.get(base_url + "/ready", timeout=1)
+        warm_up = ready.json().get("timings", {}) if ready.ok else {}
+    finally:
+        server.terminate()
+        server.wait()
+    return milestones, warm_up
+
+
+def main(port=8051, timeout=300, top=15):
+    duration, modules = measure_import()
+    print(f"Import von app.py: {duration:.2f} s (inkl. Interpreterstart)")
+    for name, cumulative in sorted(modules.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {name:<32}{cumulative:>8.3f} s")
+
+    milestones, warm_up = measure_first_response(port, timeout)
+    print("\nServerstart:")
+    for name, elapsed in milestones.items():
+        value = f"{elapsed:.2f} s" if elapsed is not None else "Timeout"
+        print(f"  {name:<32}{value:>10}")
+    print("\nZeiten laut /ready:")
+    for name, elapsed in warm_up.items():
+        print(f"  {name:<32}{elapsed:>8.3f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import- und Startzeiten des Dashboards"
+    )
+    parser.add_argument("--port", type=int, default=8051)
+    parser.add_argument("--timeout", type=int, default=300)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    main(args.port, args.timeout, args.top)
@@ -0,0 +1,72 @@
+import argparse
+import tempfile
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from forecasters import NeuralProphetForecaster
+from utils import FORECAST_CONFIG
+
+warnings.filterwarnings("ignore", category=FutureWarning)
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+# Synthetische Stundenreihe mit Tagesgang, damit der Check ohne Datenbank läuft
+def synthetic_series(hours):
+    ds = pd.date_range("2024-01-01", periods=hours, freq="H")
+    rng = np.random.default_rng(0)
+    y = 10 + 5 * np.sin(2 * np.pi * ds.hour / 24) + rng.normal(0, 0.5, hours)
+    return pd.DataFrame({"ds": ds, "y": y})
+
+
+# Funktion für einen Lauf wie im Betrieb: neue Instanz, Checkpoint von der
+# Platte, Training, Prognose
+def run_once(config, hourly):
+    forecaster = NeuralProphetForecaster(config)
+    started = time.perf_counter()
+    forecaster.fit(hourly)
+    forecast = forecaster.predict(config["periods"])
+    return forecaster, forecast, time.perf_counter() - started
+
+
+# Zwei aufeinanderfolgende Läufe: der erste trainiert vollständig, der zweite
+# muss den gespeicherten Checkpoint ohne neues Training weiterverwenden und
+# ab den neu hinzugekommenen Stunden vorhersagen
+def main(hours=7 * 24, new_hours=3, epochs=10):
+    history = synthetic_series(hours + new_hours)
+    with tempfile.TemporaryDirectory() as model_dir:
+        config = dict(FORECAST_CONFIG, model_dir=model_dir, full_epochs=epochs)
+        first, _, first_time = run_once(config, history[:hours])
+        second, forecast, second_time = run_once(config, history)
+
+    print(f"1. Lauf: {first.last_fit:<10}{first_time:>8.2f} s")
+    print(f"2. Lauf: {second.last_fit:<10}{second_time:>8.2f} s")
+    failures = []
+    if first.last_fit != "full":
+        failures.append("Der erste Lauf hat nicht vollständig trainiert")
+    if second.last_fit != "reuse":
+        failures.append("Der zweite Lauf hat den Checkpoint nicht weiterverwendet")
+    if second.state["last_full_train"] != first.state["last_full_train"]:
+        failures.append("Der zweite Lauf hat neu trainiert")
+    if second.state["model_version"] != first.state["model_version"]:
+        failures.append("Die Modellversion hat sich ohne Training geändert")
+    if second.state["watermark"] != history["ds"].iloc[-1]:
+        failures.append("Der Wasserstand wurde nicht fortgeschrieben")
+    if forecast["ds"].iloc[0] != history["ds"].iloc[-1] + pd.Timedelta(hours=1):
+        failures.append("Die Vorhersage beginnt nicht nach der letzten Stunde")
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    if failures:
+        raise SystemExit(1)
+    print("OK: Der zweite Lauf verwendet den Checkpoint des ersten weiter.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Prüft, dass die stündliche Prognose den Checkpoint weiterverwendet"
+    )
+    parser.add_argument("--hours", type=int, default=7 * 24)
+    parser.add_argument("--new-hours", type=int, default=3)
+    parser.add_argument("--epochs", type=int, default=10)
+    args = parser.parse_args()
+    main(args.hours, args.new_hours, args.epochs)
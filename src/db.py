@@ -0,0 +1,184 @@
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import pool
+
+# Datenbank-Verbindungsdetails
+DB_DETAILS = {
+    "dbname": "Umweltmonitoring",
+    "user": "postgres",
+    "password": "1234",
+    "host": "localhost",
+    "port": 5432,
+}
+
+# Standard-senseBox, deren Daten Dashboard und Prognose anzeigen
+DEFAULT_SENSEBOX_ID = "6252afcfd7e732001bb6b9f7"
+
+# Einstellungen des Verbindungspools
+# checkout_timeout: maximale Wartezeit in Sekunden auf eine freie Verbindung
+# health_check: Verbindung vor der Herausgabe mit "SELECT 1" prüfen
+POOL_CONFIG = {
+    "minconn": 1,
+    "maxconn": 10,
+    "checkout_timeout": 10,
+    "health_check": True,
+}
+
+_pool = None
+_slots = None
+_layout = {}
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "in_use": 0,
+    "peak_in_use": 0,
+    "waits": 0,
+    "wait_time": 0.0,
+    "timeouts": 0,
+    "reconnects": 0,
+}
+
+
+# Funktion zur Herstellung einer einzelnen Verbindung außerhalb des Pools,
+# z.B. zur Systemdatenbank "postgres" beim Anlegen der Datenbank
+def get_db_connection(dbname):
+    return psycopg2.connect(
+        dbname=dbname,
+        user=DB_DETAILS["user"],
+        password=DB_DETAILS["password"],
+        host=DB_DETAILS["host"],
+        port=DB_DETAILS["port"],
+    )
+
+
+# Funktion zum (einmaligen) Erzeugen des prozessweiten Pools
+def get_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            _pool = pool.ThreadedConnectionPool(
+                POOL_CONFIG["minconn"],
+                POOL_CONFIG["maxconn"],
+                dbname=DB_DETAILS["dbname"],
+                user=DB_DETAILS["user"],
+                password=DB_DETAILS["password"],
+                host=DB_DETAILS["host"],
+                port=DB_DETAILS["port"],
+            )
+            _slots = threading.BoundedSemaphore(POOL_CONFIG["maxconn"])
+        return _pool
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    if not POOL_CONFIG["health_check"]:
+        return True
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+# Verbindung aus dem Pool ausleihen; bei Erfolg wird committet, bei einem
+# Fehler zurückgerollt und die Verbindung anschließend zurückgegeben
+@contextmanager
+def connection():
+    db_pool = get_pool()
+    started = time.monotonic()
+    if not _slots.acquire(blocking=False):
+        with _stats_lock:
+            _stats["waits"] += 1
+        if not _slots.acquire(timeout=POOL_CONFIG["checkout_timeout"]):
+            with _stats_lock:
+                _stats["timeouts"] += 1
+            raise pool.PoolError(
+                f"Keine freie Datenbankverbindung nach {POOL_CONFIG['checkout_timeout']} Sekunden"
+            )
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        if not _is_healthy(conn):
+            db_pool.putconn(conn, close=True)
+            conn = db_pool.getconn()
+            with _stats_lock:
+                _stats["reconnects"] += 1
+        with _stats_lock:
+            _stats["checkouts"] += 1
+            _stats["wait_time"] += time.monotonic() - started
+            _stats["in_use"] += 1
+            _stats["peak_in_use"] = max(_stats["peak_in_use"], _stats["in_use"])
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            with _stats_lock:
+                _stats["in_use"] -= 1
+    finally:
+        if conn is not None:
+            db_pool.putconn(conn, close=bool(conn.closed))
+        _slots.release()
+
+
+# Funktion zum Abrufen der Pool-Statistiken (z.B. zur Dimensionierung)
+def pool_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["minconn"] = POOL_CONFIG["minconn"]
+    stats["maxconn"] = POOL_CONFIG["maxconn"]
+    stats["avg_wait_time"] = (
+        stats["wait_time"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    )
+    return stats
+
+
+# Funktion zum Prüfen, ob measurement im kompakten Layout vorliegt (smallint
+# sensor_key statt sensor_id); das Ergebnis wird prozessweit zwischengespeichert
+def measurement_is_compact(cur):
+    if "compact" not in _layout:
+        cur.execute(
+            """
+            SELECT to_regclass('public.measurement') IS NOT NULL, EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = 'measurement'
+                  AND column_name = 'sensor_key'
+            );
+            """
+        )
+        table_exists, compact = cur.fetchone()
+        if not table_exists:
+            return False
+        _layout["compact"] = compact
+    return _layout["compact"]
+
+
+# Join-Bedingung zwischen measurement (Alias m) und sensor (Alias s)
+def measurement_sensor_join(cur):
+    if measurement_is_compact(cur):
+        return "m.sensor_key = s.sensor_key"
+    return "m.sensor_id = s.sensor_id"
+
+
+# Funktion zum Verwerfen des zwischengespeicherten Layouts (nach einer Migration)
+def reset_measurement_layout():
+    _layout.clear()
+
+
+# Funktion zum Schließen aller Verbindungen des Pools
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
@@ -1,86 +1,478 @@
+import io
+import threading
+from datetime import timedelta
 import pandas as pd
-import psycopg2
 from psycopg2 import sql
+from db import connection, measurement_sensor_join
 
-# Datenbank-Verbindungsdetails
-DB_DETAILS = {
-    "dbname": "Umweltmonitoring",
-    "user": "postgres",
-    "password": "1234",
-    "host": "localhost",
-    "port": 5432,
+
+# Einstellungen des Caches für fetch_cached_sensor_frame
+# overlap_minutes: Zeitraum vor dem letzten Messzeitpunkt, der bei jeder
+# Aktualisierung erneut gelesen wird, um verspätet eingefügte Werte zu erfassen
+CACHE_CONFIG = {
+    "overlap_minutes": 15,
+}
+
+# Datentyp der Messwerte beim Dekodieren (float32 halbiert den Speicherbedarf)
+FETCH_CONFIG = {
+    "value_dtype": "float32",
+}
+
+# Bucket-Kürzel -> date_trunc-Einheit und erlaubte Aggregationen für fetch_sensor_frame
+BUCKET_UNITS = {
+    "H": "hour",
+    "D": "day",
+    "W": "week",
+}
+AGGREGATIONS = {
+    "avg": "AVG",
+    "min": "MIN",
+    "max": "MAX",
+    "sum": "SUM",
 }
 
+# Sensoren der Tagesstatistik
+DAILY_STATS_SENSORS = {
+    "temperature": "Temperature in °C",
+    "rain": "Rain (1h) in mm",
+    "radiation": "Global Radiation in W/m2",
+}
+
+# Prozessweiter Cache der breiten DataFrames je Abfrage (Sensoren, Bucket,
+# Aggregation, senseBox) mit dem jeweils letzten Messzeitpunkt
+_cache_lock = threading.Lock()
+_cache = {}
+
+# Prozessweiter Cache der Tagesstatistik abgeschlossener Tage je senseBox
+_daily_stats_lock = threading.Lock()
+_daily_stats = {}
+
+# Prozessweiter Cache der letzten Messwerte je Sensor und ihrer Datenversion
+_latest_lock = threading.Lock()
+_latest = {"version": None, "values": None}
+
 
-# Funktion zur Herstellung der Datenbankverbindung
-def get_db_connection(dbname):
-    return psycopg2.connect(
-        dbname=dbname,
-        user=DB_DETAILS["user"],
-        password=DB_DETAILS["password"],
-        host=DB_DETAILS["host"],
-        port=DB_DETAILS["port"],
+# Funktion zum Einlesen eines Abfrageergebnisses per COPY als typisiertes
+# DataFrame; die Werte werden direkt als NumPy-Spalten dekodiert statt über
+# psycopg2-Tupel mit einzelnen Python-Objekten (Decimal, datetime) je Zelle
+def read_query_frame(cur, query, params=None, dtype=None, datetime_columns=()):
+    buffer = io.StringIO()
+    copy_query = cur.mogrify(query, params).decode("utf-8").rstrip().rstrip(";")
+    cur.copy_expert(f"COPY ({copy_query}) TO STDOUT WITH (FORMAT csv, HEADER true)", buffer)
+    buffer.seek(0)
+    df = pd.read_csv(buffer, dtype=dtype)
+    for column in datetime_columns:
+        df[column] = pd.to_datetime(df[column], format="ISO8601")
+    return df
+
+
+# Funktion zum Abrufen der Messdaten im Langformat, optional gefiltert nach
+# Sensoren und Startzeitpunkt
+def fetch_measurement_frame(cur, sensor_ids=None, since=None):
+    conditions = []
+    params = []
+    if sensor_ids:
+        conditions.append("s.sensor_id = ANY(%s)")
+        params.append(sensor_ids)
+    if since is not None:
+        conditions.append("m.created_at >= %s")
+        params.append(since)
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+    query = f"""
+        SELECT s.title || ' in ' || s.unit AS sensor_unit, m.created_at, m.value::float8 AS value
+        FROM measurement m
+        JOIN sensor s ON {measurement_sensor_join(cur)}
+        {where_clause}
+        ORDER BY m.created_at
+    """
+    return read_query_frame(
+        cur,
+        query,
+        params,
+        dtype={"sensor_unit": "category", "value": FETCH_CONFIG["value_dtype"]},
+        datetime_columns=["created_at"],
     )
 
 
+# Funktion zum Pivotieren der Messdaten (eine Spalte je Sensor)
+def pivot_sensor_data(df):
+    # Pivotiere das DataFrame
+    df_pivot = df.pivot(index="created_at", columns="sensor_unit", values="value")
+    df_pivot.columns = df_pivot.columns.astype(str)
+
+    # Setze den Index zurück, um 'created_at' wieder als Spalte zu erhalten
+    df_pivot.reset_index(inplace=True)
+
+    return df_pivot
+
+
 # Kombinierte Funktion zum Abrufen und Pivotieren der Messdaten aus der Datenbank
 def fetch_and_pivot_sensor_data(sensor_ids=None):
-    conn = get_db_connection(DB_DETAILS["dbname"])
-    cur = conn.cursor()
+    with connection() as conn:
+        cur = conn.cursor()
+        df = fetch_measurement_frame(cur, sensor_ids=sensor_ids)
+        cur.close()
+    return pivot_sensor_data(df)
+
+
+# Funktion zum Abrufen eines Zeitausschnitts als breites DataFrame (eine Spalte
+# je Sensor "Titel in Einheit"); das Pivotieren erfolgt per FILTER in SQL
+# start/end: Zeitfenster [start, end), sensors: Liste von Spaltennamen,
+# bucket: optional "H", "D" oder "W", agg: Aggregation innerhalb eines Buckets,
+# sensebox_id: nur Sensoren dieser senseBox (None = alle senseBoxen)
+def fetch_sensor_frame(
+    start=None, end=None, sensors=None, bucket=None, agg="avg", sensebox_id=None
+):
+    with connection() as conn:
+        cur = conn.cursor()
+
+        cur.execute(
+            """
+            SELECT sensor_id, title || ' in ' || unit FROM sensor
+            WHERE %(sensebox_id)s IS NULL OR sensebox_id = %(sensebox_id)s;
+            """,
+            {"sensebox_id": sensebox_id},
+        )
+        sensor_ids = {}
+        for sensor_id, sensor_unit in cur.fetchall():
+            if sensors is None or sensor_unit in sensors:
+                sensor_ids.setdefault(sensor_unit, []).append(sensor_id)
+        columns = [
+            sensor for sensor in (sensors or sorted(sensor_ids)) if sensor in sensor_ids
+        ]
+        if not columns:
+            cur.close()
+            df = pd.DataFrame(columns=["created_at"] + list(sensors or []))
+            df["created_at"] = pd.to_datetime(df["created_at"])
+            return df
+
+        if bucket:
+            time_expr = sql.SQL("date_trunc({}, m.created_at)").format(
+                sql.Literal(BUCKET_UNITS[bucket])
+            )
+        else:
+            time_expr = sql.SQL("m.created_at")
+        agg_function = sql.SQL(AGGREGATIONS[agg])
+
+        value_columns = [
+            sql.SQL("({}(m.value) FILTER (WHERE s.sensor_id = ANY({})))::float8 AS {}").format(
+                agg_function, sql.Literal(sensor_ids[column]), sql.Identifier(column)
+            )
+            for column in columns
+        ]
+        conditions = [
+            sql.SQL("s.sensor_id = ANY({})").format(
+                sql.Literal([i for column in columns for i in sensor_ids[column]])
+            )
+        ]
+        if start is not None:
+            conditions.append(
+                sql.SQL("m.created_at >= {}").format(sql.Literal(start))
+            )
+        if end is not None:
+            conditions.append(sql.SQL("m.created_at < {}").format(sql.Literal(end)))
 
-    if sensor_ids:
         query = sql.SQL(
             """
-            SELECT s.title AS sensor_title, s.unit, s.sensor_id, m.created_at, m.value
+            SELECT {time_expr} AS created_at, {value_columns}
             FROM measurement m
-            JOIN sensor s ON m.sensor_id = s.sensor_id
-            WHERE m.sensor_id = ANY(%s)
-            ORDER BY m.created_at;
+            JOIN sensor s ON {join_condition}
+            WHERE {conditions}
+            GROUP BY 1
+            ORDER BY 1
         """
+        ).format(
+            time_expr=time_expr,
+            join_condition=sql.SQL(measurement_sensor_join(cur)),
+            value_columns=sql.SQL(", ").join(value_columns),
+            conditions=sql.SQL(" AND ").join(conditions),
         )
-        cur.execute(query, (sensor_ids,))
-    else:
+        df = read_query_frame(
+            cur,
+            query.as_string(conn),
+            dtype={column: FETCH_CONFIG["value_dtype"] for column in columns},
+            datetime_columns=["created_at"],
+        )
+        cur.close()
+
+    return df
+
+
+# Funktion zum Abrufen eines breiten DataFrames ab start über den
+# prozessweiten Cache: beim ersten Aufruf wird das gesamte Fenster geladen,
+# danach nur noch Zeilen ab dem letzten Messzeitpunkt (abzüglich Überlappung,
+# bei Buckets auf den Bucket-Anfang gerundet). Ohne neue Daten kostet eine
+# Aktualisierung nur eine kleine Abfrage; vollständig neu geladen wird nur
+# nach invalidate_cache(). Zurückgegeben wird jeweils eine Kopie
+def fetch_cached_sensor_frame(
+    start=None, sensors=None, bucket=None, agg="avg", sensebox_id=None
+):
+    key = (tuple(sensors) if sensors else None, bucket, agg, sensebox_id)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is None or cached["high_water"] is None:
+            df = fetch_sensor_frame(start, None, sensors, bucket, agg, sensebox_id)
+        else:
+            since = cached["high_water"] - timedelta(
+                minutes=CACHE_CONFIG["overlap_minutes"]
+            )
+            if bucket:
+                since = pd.Timestamp(since).floor(bucket)
+            df_new = fetch_sensor_frame(since, None, sensors, bucket, agg, sensebox_id)
+            df = cached["df"]
+            if not df_new.empty:
+                # Überlappungszeitraum vollständig durch die neu gelesenen Zeilen ersetzen
+                df = pd.concat([df[df["created_at"] < since], df_new], ignore_index=True)
+
+        if start is not None:
+            df = df[df["created_at"] >= pd.Timestamp(start)].reset_index(drop=True)
+        _cache[key] = {
+            "df": df,
+            "high_water": df["created_at"].iloc[-1] if not df.empty else None,
+        }
+        return df.copy()
+
+
+# Funktion zum Verwerfen des Caches, der nächste Aufruf lädt alles neu
+# (z. B. nach einem Backfill älterer Zeiträume)
+def invalidate_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+# Funktion zum Abrufen der voraggregierten Werte eines Sensors ("Titel in Einheit")
+# bucket_size: "H" (stündlich), "D" (täglich) oder "W" (wöchentlich)
+# sensebox_id: nur Sensoren dieser senseBox (None = alle senseBoxen)
+def fetch_rollup(sensor_unit, bucket_size, sensebox_id=None):
+    with connection() as conn:
+        cur = conn.cursor()
+
         query = """
-            SELECT s.title AS sensor_title, s.unit, s.sensor_id, m.created_at, m.value
-            FROM measurement m
-            JOIN sensor s ON m.sensor_id = s.sensor_id
-            ORDER BY m.created_at;
+            SELECT r.bucket,
+                   MIN(r.value_min)::float8,
+                   (SUM(r.value_sum) / NULLIF(SUM(r.value_count), 0))::float8,
+                   MAX(r.value_max)::float8,
+                   SUM(r.value_sum)::float8
+            FROM measurement_rollup r
+            JOIN sensor s ON r.sensor_id = s.sensor_id
+            WHERE r.bucket_size = %(bucket_size)s
+              AND s.title || ' in ' || s.unit = %(sensor_unit)s
+              AND (%(sensebox_id)s IS NULL OR s.sensebox_id = %(sensebox_id)s)
+            GROUP BY r.bucket
+            ORDER BY r.bucket;
         """
-        cur.execute(query)
+        cur.execute(
+            query,
+            {
+                "bucket_size": bucket_size,
+                "sensor_unit": sensor_unit,
+                "sensebox_id": sensebox_id,
+            },
+        )
+        rows = cur.fetchall()
+        cur.close()
 
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    return pd.DataFrame(rows, columns=["created_at", "min", "mean", "max", "sum"])
 
-    df = pd.DataFrame(
-        rows, columns=["sensor_title", "unit", "sensor_id", "created_at", "value"]
-    )
 
-    # Erstelle eine neue Spalte für den kombinierten Sensor-Titel und Einheit
-    df["sensor_unit"] = df["sensor_title"] + " in " + df["unit"]
+# Funktion zum Abrufen der Datenversion: letzter Messzeitpunkt über alle
+# Sensoren der senseBox laut Watermarks (eine Abfrage auf der kleinen
+# Watermark-Tabelle; sensebox_id None = alle senseBoxen)
+def fetch_data_version(sensebox_id=None):
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT MAX(last_created_at) FROM ingest_watermark
+            WHERE %(sensebox_id)s IS NULL OR sensebox_id = %(sensebox_id)s;
+            """,
+            {"sensebox_id": sensebox_id},
+        )
+        version = cur.fetchone()[0]
+        cur.close()
+    return version
 
-    # Pivotiere das DataFrame
-    df_pivot = df.pivot(index="created_at", columns="sensor_unit", values="value")
 
-    # Setze den Index zurück, um 'created_at' wieder als Spalte zu erhalten
-    df_pivot.reset_index(inplace=True)
+# Funktion zum Abrufen des letzten gültigen Messwerts je Sensor ("Titel in
+# Einheit" -> Wert); je Sensor genügt ein Zugriff auf den Index
+# (sensor, created_at), die Kosten hängen nicht vom Umfang der Historie ab.
+# Mit "version" (siehe fetch_data_version) wird das Ergebnis zwischengespeichert,
+# bis sich die Datenversion ändert. sensebox_id: nur Sensoren dieser senseBox
+# (None = alle senseBoxen)
+def fetch_latest_values(version=None, sensebox_id=None):
+    with _latest_lock:
+        if version is not None and _latest["version"] == (sensebox_id, version):
+            return _latest["values"]
 
-    return df_pivot
+    with connection() as conn:
+        cur = conn.cursor()
+        query = f"""
+            SELECT DISTINCT ON (s.title || ' in ' || s.unit)
+                   s.title || ' in ' || s.unit, latest.value::float8
+            FROM sensor s
+            CROSS JOIN LATERAL (
+                SELECT m.created_at, m.value
+                FROM measurement m
+                WHERE {measurement_sensor_join(cur)} AND m.value IS NOT NULL
+                ORDER BY m.created_at DESC
+                LIMIT 1
+            ) latest
+            WHERE %(sensebox_id)s IS NULL OR s.sensebox_id = %(sensebox_id)s
+            ORDER BY s.title || ' in ' || s.unit, latest.created_at DESC;
+        """
+        cur.execute(query, {"sensebox_id": sensebox_id})
+        values = dict(cur.fetchall())
+        cur.close()
 
+    with _latest_lock:
+        _latest["version"] = (sensebox_id, version)
+        _latest["values"] = values
+    return values
 
-# Funktion zum Abrufen der Sensebox-Daten
-def fetch_sensebox_info():
-    conn = get_db_connection(DB_DETAILS["dbname"])
-    cur = conn.cursor()
 
-    query = """
-        SELECT sensebox_id, name, created_at, description, exposure, last_measurement_at, latitude, longitude, altitude
-        FROM sensebox;
-    """
-    cur.execute(query)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+# Funktion zum Abrufen der Metadaten des neuesten Prognoselaufs eines Sensors
+# (run_id, model_version, watermark, created_at); None, solange noch keine
+# Vorhersage veröffentlicht wurde
+def fetch_latest_forecast_run(sensor_unit="Temperature in °C"):
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT run_id, model_version, watermark, created_at
+            FROM forecast_run
+            WHERE sensor = %s
+            ORDER BY run_id DESC
+            LIMIT 1;
+            """,
+            (sensor_unit,),
+        )
+        row = cur.fetchone()
+        cur.close()
+    return row
+
+
+# Funktion zum Abrufen der Vorhersagewerte eines Prognoselaufs
+def fetch_forecast(run_id):
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT ds, y FROM forecast WHERE run_id = %s ORDER BY ds;", (run_id,)
+        )
+        rows = cur.fetchall()
+        cur.close()
+
+    return pd.DataFrame(rows, columns=["ds", "y"])
+
+
+# Funktion zum Abrufen der Tagesstatistik (max./min. Temperatur, Regensumme,
+# mittlere Globalstrahlung) für alle Tage in [start, end) mit einer gruppierten
+# Abfrage auf den Tages-Rollups; Tage ohne Messwerte fehlen im Ergebnis
+# sensebox_id: nur Sensoren dieser senseBox (None = alle senseBoxen)
+def fetch_daily_stats(start, end, sensebox_id=None):
+    with connection() as conn:
+        cur = conn.cursor()
+
+        query = """
+            SELECT r.bucket::date AS day,
+                   (MAX(r.value_max) FILTER (WHERE s.title || ' in ' || s.unit = %(temperature)s))::float8 AS max_temp,
+                   (MIN(r.value_min) FILTER (WHERE s.title || ' in ' || s.unit = %(temperature)s))::float8 AS min_temp,
+                   (SUM(r.value_sum) FILTER (WHERE s.title || ' in ' || s.unit = %(rain)s))::float8 AS sum_rain,
+                   (SUM(r.value_sum) FILTER (WHERE s.title || ' in ' || s.unit = %(radiation)s)
+                    / NULLIF(SUM(r.value_count) FILTER (WHERE s.title || ' in ' || s.unit = %(radiation)s), 0))::float8 AS avg_radiation
+            FROM measurement_rollup r
+            JOIN sensor s ON r.sensor_id = s.sensor_id
+            WHERE r.bucket_size = 'D' AND r.bucket >= %(start)s AND r.bucket < %(end)s
+              AND s.title || ' in ' || s.unit IN (%(temperature)s, %(rain)s, %(radiation)s)
+              AND (%(sensebox_id)s IS NULL OR s.sensebox_id = %(sensebox_id)s)
+            GROUP BY r.bucket
+            ORDER BY r.bucket;
+        """
+        cur.execute(
+            query,
+            {
+                **DAILY_STATS_SENSORS,
+                "start": start,
+                "end": end,
+                "sensebox_id": sensebox_id,
+            },
+        )
+        rows = cur.fetchall()
+        cur.close()
+
+    columns = ["day", "max_temp", "min_temp", "sum_rain", "avg_radiation"]
+    return pd.DataFrame(rows, columns=columns).set_index("day").astype(float)
+
+
+# Funktion zum Abrufen des Zeitpunkts, bis zu dem die Messwerte aller Sensoren
+# der Tagesstatistik vorliegen: kleinste Watermark dieser Sensoren; None,
+# solange einer von ihnen noch keine Watermark hat. Die Rollups werden in
+# derselben Transaktion wie die Watermark nachgeführt und sind bis dahin aktuell.
+def fetch_daily_stats_watermark(sensebox_id=None):
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT CASE WHEN COUNT(w.last_created_at) = COUNT(*)
+                        THEN MIN(w.last_created_at) END
+            FROM sensor s
+            LEFT JOIN ingest_watermark w ON w.sensor_id = s.sensor_id
+            WHERE s.title || ' in ' || s.unit IN (%(temperature)s, %(rain)s, %(radiation)s)
+              AND (%(sensebox_id)s IS NULL OR s.sensebox_id = %(sensebox_id)s);
+            """,
+            {**DAILY_STATS_SENSORS, "sensebox_id": sensebox_id},
+        )
+        watermark = cur.fetchone()[0]
+        cur.close()
+    return watermark
+
+
+# Funktion zum Abrufen der Tagesstatistik der angegebenen Tage (date-Objekte)
+# Abgeschlossene Tage ändern sich nicht mehr und werden zwischengespeichert;
+# als abgeschlossen gilt ein Tag erst, wenn die Watermarks aller beteiligten
+# Sensoren (siehe fetch_daily_stats_watermark) nach seinem Ende liegen, da
+# Messwerte verzögert eintreffen. Fehlende Tage werden mit einer Abfrage über
+# ihren Zeitraum nachgeladen.
+def get_daily_stats(days, sensebox_id=None):
+    with _daily_stats_lock:
+        stats = {
+            day: _daily_stats[(sensebox_id, day)]
+            for day in days
+            if (sensebox_id, day) in _daily_stats
+        }
+    missing = [day for day in days if day not in stats]
+    if missing:
+        # Watermark vor den Rollups lesen: alles bis zu ihr ist bereits committet
+        complete_before = fetch_daily_stats_watermark(sensebox_id)
+        df = fetch_daily_stats(
+            min(missing), max(missing) + timedelta(days=1), sensebox_id
+        )
+        fetched = df.to_dict("index")
+        with _daily_stats_lock:
+            for day in missing:
+                if day not in fetched:
+                    continue
+                stats[day] = fetched[day]
+                if complete_before is not None and pd.Timestamp(
+                    day + timedelta(days=1)
+                ) <= pd.Timestamp(complete_before):
+                    _daily_stats[(sensebox_id, day)] = fetched[day]
+    return [{"day": day, **stats[day]} for day in days if day in stats]
+
+
+# Funktion zum Abrufen der Sensebox-Daten (sensebox_id None = alle senseBoxen)
+def fetch_sensebox_info(sensebox_id=None):
+    with connection() as conn:
+        cur = conn.cursor()
+
+        query = """
+            SELECT sensebox_id, name, created_at, description, exposure, last_measurement_at, latitude, longitude, altitude
+            FROM sensebox
+            WHERE %(sensebox_id)s IS NULL OR sensebox_id = %(sensebox_id)s;
+        """
+        cur.execute(query, {"sensebox_id": sensebox_id})
+        rows = cur.fetchall()
+        cur.close()
 
     columns = [
         "sensebox_id",
@@ -0,0 +1,49 @@
+import argparse
+import multiprocessing
+import os
+import warnings
+from apscheduler.executors.pool import ProcessPoolExecutor
+from utils import (
+    FORECAST_CONFIG,
+    FORECAST_SENSORS,
+    init_forecast_worker,
+    train_and_update_forecast,
+)
+
+warnings.filterwarnings("ignore", category=FutureWarning)
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+# Executor für den Scheduler: das Training läuft in eigenen Prozessen, damit
+# es weder den GIL noch die CPU-Zeit des Webservers beansprucht. Je Sensor ein
+# Job, bis zu max_workers Prozesse; die CPU-Kerne werden gleichmäßig auf die
+# Prozesse verteilt (Torch-Threads je Prozess).
+# "spawn" statt "fork", damit die Kindprozesse keine Verbindungen aus dem
+# Pool des Dash-Prozesses erben.
+def create_forecast_executor():
+    cpus = os.cpu_count() or 1
+    workers = min(FORECAST_CONFIG["max_workers"] or cpus, cpus, len(FORECAST_SENSORS))
+    return ProcessPoolExecutor(
+        workers,
+        pool_kwargs={
+            "mp_context": multiprocessing.get_context("spawn"),
+            "initializer": init_forecast_worker,
+            "initargs": (max(1, cpus // workers),),
+        },
+    )
+
+
+# Funktion für einen Prognoselauf eines Sensors (None = alle Sensoren
+# nacheinander); das Ergebnis wird veröffentlicht und vom Dashboard nur noch
+# gelesen
+def run_forecast(sensor=None):
+    train_and_update_forecast([sensor] if sensor else None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Trainiert das Prognosemodell und veröffentlicht die Vorhersage"
+    )
+    parser.add_argument("--sensor", choices=sorted(FORECAST_SENSORS))
+    args = parser.parse_args()
+    run_forecast(args.sensor)
@@ -0,0 +1,232 @@
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+
+# Forecast engines behind utils.train_and_predict
+# fit() trains on an hourly series with the columns ds/y, predict() returns the
+# next "periods" hours with the same columns. After fit(), "state" holds the
+# training watermark and the model version of the fitted model.
+class Forecaster(ABC):
+    name = None
+    # Engines that need a process of their own (torch) when fitting in parallel
+    isolated = False
+
+    def __init__(self, config, sensor="Temperature in °C"):
+        self.config = config
+        self.sensor = sensor
+        self.state = None
+
+    @abstractmethod
+    def fit(self, hourly):
+        pass
+
+    @abstractmethod
+    def predict(self, periods):
+        pass
+
+    def future_index(self, periods):
+        return pd.date_range(
+            self.state["watermark"] + timedelta(hours=1), periods=periods, freq="H"
+        )
+
+
+def regular_hourly(hourly):
+    # Close gaps on the hourly grid, the seasonal models index by position
+    y = hourly.set_index("ds")["y"].asfreq("H")
+    return y.interpolate(limit_direction="both")
+
+
+def sensor_slug(sensor):
+    return re.sub(r"[^a-z0-9]+", "_", sensor.lower()).strip("_")
+
+
+# NeuralProphet with a checkpoint per sensor: hourly runs forecast with the
+# persisted model from the hours newer than its watermark, a full retrain from
+# scratch happens every full_retrain_hours. Without checkpoint the model is
+# always trained from scratch (e.g. for benchmarks).
+class NeuralProphetForecaster(Forecaster):
+    name = "neuralprophet"
+    isolated = True
+
+    def __init__(self, config, sensor="Temperature in °C", checkpoint=True):
+        super().__init__(config, sensor)
+        self.checkpoint = checkpoint
+        self.model = None
+        self.hourly = None
+        # "full" (trained from scratch) or "reuse" (checkpoint) after fit()
+        self.last_fit = None
+
+    def model_paths(self):
+        model_dir = self.config["model_dir"]
+        slug = sensor_slug(self.sensor)
+        return (
+            os.path.join(model_dir, f"{slug}.np"),
+            os.path.join(model_dir, f"{slug}.json"),
+        )
+
+    def load_checkpoint(self):
+        from neuralprophet import load
+
+        model_path, state_path = self.model_paths()
+        if not (os.path.exists(model_path) and os.path.exists(state_path)):
+            return None, None
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            state["watermark"] = pd.Timestamp(state["watermark"])
+            state["last_full_train"] = datetime.fromisoformat(state["last_full_train"])
+            return load(model_path), state
+        except Exception as e:
+            print(f"Could not load forecast checkpoint for {self.sensor}, retraining: {e}")
+            return None, None
+
+    def save_checkpoint(self):
+        from neuralprophet import save
+
+        model_path, state_path = self.model_paths()
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        save(self.model, model_path)
+        with open(state_path, "w") as f:
+            json.dump(
+                {
+                    "watermark": self.state["watermark"].isoformat(),
+                    "last_full_train": self.state["last_full_train"].isoformat(),
+                },
+                f,
+            )
+
+    def fit(self, hourly):
+        from neuralprophet import NeuralProphet
+        from neuralprophet import __version__ as neuralprophet_version
+
+        self.hourly = hourly
+        m, state = self.load_checkpoint() if self.checkpoint else (None, None)
+        now = datetime.now()
+        full_retrain_due = state is None or now - state[
+            "last_full_train"
+        ] >= timedelta(hours=self.config["full_retrain_hours"])
+
+        # NeuralProphet cannot continue training a fitted model
+        # (continue_training raises NotImplementedError), so between full
+        # retrains the checkpoint is reused as is; it forecasts from the
+        # latest hours passed to predict()
+        if m is None or full_retrain_due:
+            m = NeuralProphet()
+            m.fit(hourly, freq="H", epochs=self.config["full_epochs"])
+            state = {"last_full_train": now}
+            self.last_fit = "full"
+        else:
+            self.last_fit = "reuse"
+
+        self.model = m
+        self.state = state
+        if state.get("watermark") != hourly["ds"].iloc[-1]:
+            state["watermark"] = hourly["ds"].iloc[-1]
+            if self.checkpoint:
+                self.save_checkpoint()
+        # Reused checkpoints keep the version of their last full retrain
+        state["model_version"] = (
+            f"neuralprophet-{neuralprophet_version}+{state['last_full_train']:%Y%m%dT%H%M}"
+        )
+        return self
+
+    def predict(self, periods):
+        future = self.model.make_future_dataframe(self.hourly, periods=periods)
+        forecast = self.model.predict(future)
+        forecast = forecast[["ds", "yhat1"]]
+        forecast.columns = ["ds", "y"]
+        return forecast
+
+
+# Seasonal naive: every future hour repeats the value of the same hour one
+# season (season_length hours) earlier
+class SeasonalNaiveForecaster(Forecaster):
+    name = "seasonal_naive"
+
+    def fit(self, hourly):
+        y = regular_hourly(hourly)
+        self.last_season = y.to_numpy()[-self.config["season_length"] :]
+        self.state = {"watermark": y.index[-1], "model_version": self.name}
+        return self
+
+    def predict(self, periods):
+        season = self.last_season
+        values = season[np.arange(periods) % len(season)]
+        return pd.DataFrame({"ds": self.future_index(periods), "y": values})
+
+
+# Additive Holt-Winters (level, trend, daily season). The smoothing parameters
+# are chosen from a grid by the one-step-ahead error; all grid combinations
+# are run at once as NumPy vectors, the loop only runs over time.
+class HoltWintersForecaster(Forecaster):
+    name = "holt_winters"
+    alphas = (0.1, 0.3, 0.5, 0.8)
+    betas = (0.0, 0.01, 0.05)
+    gammas = (0.05, 0.1, 0.3, 0.5)
+
+    def fit(self, hourly):
+        y = regular_hourly(hourly)
+        values = y.to_numpy(dtype=float)
+        m = self.config["season_length"]
+        if len(values) < 2 * m:
+            raise ValueError(
+                f"Holt-Winters needs at least {2 * m} hourly values, got {len(values)}"
+            )
+
+        alpha, beta, gamma = (
+            grid.ravel() for grid in np.meshgrid(self.alphas, self.betas, self.gammas)
+        )
+        combos = len(alpha)
+        level = np.full(combos, values[:m].mean())
+        trend = np.full(combos, (values[m : 2 * m].mean() - values[:m].mean()) / m)
+        season = np.tile(values[:m] - values[:m].mean(), (combos, 1))
+        sse = np.zeros(combos)
+
+        for t in range(m, len(values)):
+            s = season[:, t % m]
+            sse += (values[t] - (level + trend + s)) ** 2
+            new_level = alpha * (values[t] - s) + (1 - alpha) * (level + trend)
+            trend = beta * (new_level - level) + (1 - beta) * trend
+            season[:, t % m] = gamma * (values[t] - new_level) + (1 - gamma) * s
+            level = new_level
+
+        best = int(np.argmin(sse))
+        self.level = level[best]
+        self.trend = trend[best]
+        # Season in the order of the hours following the last value
+        self.season = np.roll(season[best], -(len(values) % m))
+        self.params = (alpha[best], beta[best], gamma[best])
+        self.state = {"watermark": y.index[-1], "model_version": self.name}
+        return self
+
+    def predict(self, periods):
+        steps = np.arange(1, periods + 1)
+        values = (
+            self.level
+            + steps * self.trend
+            + self.season[(steps - 1) % len(self.season)]
+        )
+        return pd.DataFrame({"ds": self.future_index(periods), "y": values})
+
+
+FORECASTERS = {
+    forecaster.name: forecaster
+    for forecaster in (
+        NeuralProphetForecaster,
+        SeasonalNaiveForecaster,
+        HoltWintersForecaster,
+    )
+}
+
+
+def create_forecaster(name, config, sensor="Temperature in °C", **options):
+    if name not in FORECASTERS:
+        raise ValueError(
+            f"Unknown forecast engine '{name}', expected one of {sorted(FORECASTERS)}"
+        )
+    return FORECASTERS[name](config, sensor, **options)
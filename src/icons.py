@@ -0,0 +1,46 @@
+import hashlib
+import os
+from types import MappingProxyType
+from flask import Response, abort, request
+
+# URL prefix under which the icons are served
+ICON_URL_PREFIX = "/svg"
+
+
+# Read all SVG icons once into an immutable registry:
+# filename -> (content, etag)
+def load_icon_registry(svg_dir):
+    icons = {}
+    for filename in sorted(os.listdir(svg_dir)):
+        if not filename.endswith(".svg"):
+            continue
+        with open(os.path.join(svg_dir, filename), "rb") as f:
+            content = f.read()
+        icons[filename] = (content, hashlib.sha1(content).hexdigest()[:12])
+    return MappingProxyType(icons)
+
+
+# Versioned URL of an icon; the version changes with the content, so browsers
+# can cache the icon without revalidating
+def icon_url(registry, filename):
+    if filename not in registry:
+        raise FileNotFoundError(f"No such icon: '{filename}'")
+    return f"{ICON_URL_PREFIX}/{filename}?v={registry[filename][1]}"
+
+
+# Serve the icons from memory with ETag and long-lived cache headers
+def register_icon_route(server, registry):
+    @server.route(f"{ICON_URL_PREFIX}/<filename>")
+    def serve_icon(filename):
+        if filename not in registry:
+            abort(404)
+        content, etag = registry[filename]
+        headers = {
+            "ETag": f'"{etag}"',
+            "Cache-Control": "public, max-age=31536000, immutable",
+        }
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+        return Response(content, mimetype="image/svg+xml", headers=headers)
+
+    return serve_icon
@@ -1,19 +1,62 @@
 import requests
 import pandas as pd
 import io
-import psycopg2
 from psycopg2 import sql
 from datetime import datetime, timezone, timedelta
+from db import (
+    DB_DETAILS,
+    DEFAULT_SENSEBOX_ID,
+    connection,
+    get_db_connection,
+    measurement_is_compact,
+    measurement_sensor_join,
+    reset_measurement_layout,
+)
+from pipeline import run_pipeline
+
+# Liste der zu überwachenden senseBoxen (DEFAULT_SENSEBOX_ID siehe db.py)
+# Neue Boxen werden beim Start von main() in der Tabelle sensebox registriert
+SENSEBOX_IDS = [DEFAULT_SENSEBOX_ID]
+
+# Schema-Modus der Tabelle measurement (wirkt beim Anlegen der Tabellen)
+# compact: smallint-Sensorschlüssel und real-Werte (siehe migrate_to_compact)
+# partitioned: monatliche Range-Partitionierung nach created_at mit BRIN-Index
+# partition_start: erster Monat, partition_months_ahead: Vorlauf in Monaten
+# retention_months: Monatspartitionen, die vollständig vor den letzten
+# retention_months Monaten liegen, löscht der nächtliche Job (None = alles
+# behalten); die Rollups dieser Monate bleiben erhalten
+SCHEMA_CONFIG = {
+    "compact": False,
+    "partitioned": False,
+    "partition_start": datetime(2022, 1, 1),
+    "partition_months_ahead": 3,
+    "retention_months": None,
+}
+
+# Aggregationsstufen der Rollup-Tabelle (Kürzel im Dashboard -> date_trunc-Einheit)
+ROLLUP_BUCKETS = {
+    "H": "hour",
+    "D": "day",
+    "W": "week",
+}
 
-# Datenbank-Verbindungsdetails
-DB_DETAILS = {
-    "dbname": "Umweltmonitoring",
-    "user": "postgres",
-    "password": "1234",
-    "host": "localhost",
-    "port": 5432,
+# Nebenläufigkeit der Ingest-Pipeline (Downloads, Parser, Queue-Größe)
+# streaming: CSV-Antworten blockweise lesen und in Batches zu je batch_size
+# Zeilen an den Schreiber übergeben, statt sie vollständig im Speicher zu halten
+# initial_days: Sensoren ohne Watermark werden ab initial_days vor jetzt geladen,
+# die ältere Historie lädt backfill.py
+PIPELINE_CONFIG = {
+    "fetch_workers": 8,
+    "parse_workers": 2,
+    "queue_size": 8,
+    "streaming": True,
+    "batch_size": 50000,
+    "initial_days": 30,
 }
 
+# Zeitstempelformat der openSenseMap-CSV (z.B. 2022-01-01T00:00:00.000Z)
+CSV_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
 
 # Funktion zum Abrufen der Sensortitel und IDs
 def get_sensor_titles_and_ids(sensebox_id):
@@ -52,15 +95,63 @@ def fetch_sensor_data(sensebox_id, sensor_title, start_date, end_date):
         return ""
 
 
-# Funktion zur Herstellung der Datenbankverbindung
-def get_db_connection(dbname):
-    return psycopg2.connect(
-        dbname=dbname,
-        user=DB_DETAILS["user"],
-        password=DB_DETAILS["password"],
-        host=DB_DETAILS["host"],
-        port=DB_DETAILS["port"],
-    )
+# Funktion zum Öffnen der Sensordaten als Datenstrom (Body wird noch nicht gelesen)
+def stream_sensor_data(sensebox_id, sensor_title, start_date, end_date):
+    url = "https://api.opensensemap.org//boxes/data"
+    params = {
+        "boxid": sensebox_id,
+        "columns": "unit,value,createdAt",
+        "download": "true",
+        "format": "csv",
+        "from-date": start_date,
+        "phenomenon": sensor_title,
+        "to-date": end_date,
+    }
+    response = requests.get(url, params=params, stream=True)
+    if response.status_code == 200:
+        # gzip/deflate beim Lesen von response.raw transparent entpacken
+        response.raw.decode_content = True
+        return response
+    else:
+        print(
+            f"Fehler beim Herunterladen der CSV-Datei für {sensor_title}. Statuscode: {response.status_code}"
+        )
+        response.close()
+        return None
+
+
+# Funktion zum blockweisen Einlesen eines CSV-Datenstroms
+# Liefert DataFrames mit höchstens batch_size Zeilen, fest typisiert und mit
+# festem Zeitstempelformat, sodass der Speicherbedarf nicht mit der Länge der
+# Historie wächst
+def parse_sensor_stream(sensor, response):
+    try:
+        reader = pd.read_csv(
+            response.raw,
+            usecols=["value", "createdAt"],
+            dtype={"value": "float64", "createdAt": "string"},
+            chunksize=PIPELINE_CONFIG["batch_size"],
+        )
+        for chunk in reader:
+            chunk = chunk.rename(columns={"value": sensor.get("title")})
+            chunk["createdAt"] = pd.to_datetime(
+                chunk["createdAt"], format=CSV_TIMESTAMP_FORMAT, utc=True
+            ).dt.floor("min")
+            yield chunk
+    except pd.errors.EmptyDataError:
+        return
+    finally:
+        response.close()
+
+
+# Funktion zum Umwandeln der CSV-Daten eines Sensors in ein DataFrame
+def parse_sensor_data(sensor, csv_data):
+    df = pd.read_csv(io.StringIO(csv_data), usecols=["value", "createdAt"])
+    df = df.rename(columns={"value": sensor.get("title")})
+    df["createdAt"] = pd.to_datetime(df["createdAt"])
+    df["createdAt"] = df["createdAt"].dt.floor("min")
+    df.sort_values("createdAt", inplace=True)
+    return [df]
 
 
 # Funktion zum Erstellen der Datenbank, falls sie nicht existiert
@@ -103,9 +194,28 @@ def create_tables(cur):
         unit VARCHAR(50),
         sensor_type VARCHAR(255),
         icon VARCHAR(255),
+        sensor_key SMALLSERIAL UNIQUE,
         FOREIGN KEY (sensebox_id) REFERENCES sensebox(sensebox_id)
     );
-
+    """
+    if SCHEMA_CONFIG["compact"]:
+        create_tables_query += compact_measurement_ddl(
+            "measurement", SCHEMA_CONFIG["partitioned"]
+        )
+    elif SCHEMA_CONFIG["partitioned"]:
+        # Partitionierte Tabellen erlauben nur Schlüssel, die den
+        # Partitionsschlüssel enthalten, daher ohne measurement_id
+        create_tables_query += """
+    CREATE TABLE IF NOT EXISTS measurement (
+        sensor_id VARCHAR(50),
+        created_at TIMESTAMP NOT NULL,
+        value DECIMAL(10, 2),
+        FOREIGN KEY (sensor_id) REFERENCES sensor(sensor_id),
+        PRIMARY KEY (sensor_id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    """
+    else:
+        create_tables_query += """
     CREATE TABLE IF NOT EXISTS measurement (
         measurement_id SERIAL PRIMARY KEY,
         sensor_id VARCHAR(50),
@@ -118,6 +228,195 @@ def create_tables(cur):
     cur.execute(create_tables_query)
     print(f"Tabellen werden angelegt..")
 
+    if SCHEMA_CONFIG["partitioned"]:
+        ensure_partitions(cur)
+
+
+# Tabellendefinition des kompakten Layouts: smallint-Schlüssel aus der Tabelle
+# sensor, kein Surrogatschlüssel und Messwerte als real
+def compact_measurement_ddl(table, partitioned):
+    partition_clause = " PARTITION BY RANGE (created_at)" if partitioned else ""
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        sensor_key SMALLINT NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        value REAL,
+        FOREIGN KEY (sensor_key) REFERENCES sensor(sensor_key),
+        PRIMARY KEY (sensor_key, created_at)
+    ){partition_clause};
+    """
+
+
+# Funktion zur Migration einer bestehenden Tabelle measurement in das kompakte
+# Layout. Die Partitionierung der bestehenden Tabelle bleibt erhalten. Läuft in
+# der Transaktion des Aufrufers, bei einem Fehler bleibt alles unverändert.
+def migrate_to_compact(cur):
+    cur.execute(
+        "ALTER TABLE sensor ADD COLUMN IF NOT EXISTS sensor_key SMALLSERIAL UNIQUE;"
+    )
+    reset_measurement_layout()
+    if measurement_is_compact(cur):
+        print("Tabelle measurement liegt bereits im kompakten Layout vor.")
+        return 0
+
+    partitioned = is_partitioned(cur)
+    cur.execute(compact_measurement_ddl("measurement_compact", partitioned))
+    if partitioned:
+        ensure_partitions(cur, table="measurement_compact")
+
+    cur.execute(
+        """
+        INSERT INTO measurement_compact (sensor_key, created_at, value)
+        SELECT s.sensor_key, m.created_at, m.value
+        FROM measurement m
+        JOIN sensor s ON m.sensor_id = s.sensor_id;
+        """
+    )
+    migrated = cur.rowcount
+
+    # Alte Tabelle (samt Partitionen und Indizes) ersetzen und Namen angleichen
+    compact_partitions = []
+    if partitioned:
+        cur.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'measurement_compact'::regclass;
+            """
+        )
+        compact_partitions = [row[0] for row in cur.fetchall()]
+    cur.execute("DROP TABLE measurement;")
+    cur.execute("ALTER TABLE measurement_compact RENAME TO measurement;")
+    cur.execute("ALTER INDEX measurement_compact_pkey RENAME TO measurement_pkey;")
+    for name in compact_partitions:
+        cur.execute(
+            sql.SQL("ALTER TABLE {} RENAME TO {};").format(
+                sql.Identifier(name),
+                sql.Identifier(name.replace("measurement_compact_", "measurement_", 1)),
+            )
+        )
+    reset_measurement_layout()
+    create_indexes(cur)
+    print(f"{migrated} Messwerte in das kompakte Layout übernommen.")
+    return migrated
+
+
+# Funktion zum regelmäßigen Anlegen künftiger und Löschen abgelaufener
+# Partitionen (Scheduler-Job)
+def maintain_partitions():
+    with connection() as conn:
+        cur = conn.cursor()
+        if is_partitioned(cur):
+            ensure_partitions(cur)
+            cutoff = retention_cutoff()
+            if cutoff is not None:
+                for name in drop_partitions_before(cur, cutoff):
+                    print(f"Partition {name} gelöscht.")
+        cur.close()
+
+
+# Funktion zum Erstellen der Indizes (auch für bereits bestehende Datenbanken)
+def create_indexes(cur):
+    # Zeitbereichsabfragen über alle Sensoren, z.B. inkrementelles Nachladen im Dashboard
+    if is_partitioned(cur):
+        # Die Partitionen sind zeitlich geordnet, ein BRIN-Index genügt
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS measurement_created_at_brin ON measurement USING BRIN (created_at);"
+        )
+    else:
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS measurement_created_at_idx ON measurement (created_at);"
+        )
+
+
+# Funktion zum Prüfen, ob die Tabelle measurement nach Zeit partitioniert ist
+def is_partitioned(cur):
+    cur.execute(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('public.measurement');"
+    )
+    result = cur.fetchone()
+    return bool(result and result[0])
+
+
+def partition_name(month_start, table="measurement"):
+    return f"{table}_y{month_start.year}m{month_start.month:02d}"
+
+
+def next_month(month_start):
+    if month_start.month == 12:
+        return month_start.replace(year=month_start.year + 1, month=1)
+    return month_start.replace(month=month_start.month + 1)
+
+
+def months_before(month_start, months):
+    index = month_start.year * 12 + month_start.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+# Beginn des Aufbewahrungszeitraums (Monatsanfang) oder None ohne retention_months
+def retention_cutoff():
+    if SCHEMA_CONFIG["retention_months"] is None:
+        return None
+    now = datetime.now()
+    return months_before(
+        datetime(now.year, now.month, 1), SCHEMA_CONFIG["retention_months"]
+    )
+
+
+# Funktion zum Anlegen der Monatspartitionen vom Beginn der Historie (bzw. des
+# Aufbewahrungszeitraums) bis partition_months_ahead Monate in die Zukunft
+def ensure_partitions(cur, months_ahead=None, table="measurement"):
+    if months_ahead is None:
+        months_ahead = SCHEMA_CONFIG["partition_months_ahead"]
+    month_start = SCHEMA_CONFIG["partition_start"].replace(day=1)
+    cutoff = retention_cutoff()
+    if cutoff is not None:
+        month_start = max(month_start, cutoff)
+    last_month = datetime.now().replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    for _ in range(months_ahead):
+        last_month = next_month(last_month)
+
+    created = 0
+    while month_start <= last_month:
+        month_end = next_month(month_start)
+        cur.execute(
+            sql.SQL(
+                "CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s);"
+            ).format(
+                sql.Identifier(partition_name(month_start, table)),
+                sql.Identifier(table),
+            ),
+            (month_start, month_end),
+        )
+        created += 1
+        month_start = month_end
+    return created
+
+
+# Funktion zum Löschen aller Monatspartitionen, die vollständig vor "cutoff" liegen
+def drop_partitions_before(cur, cutoff):
+    cur.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'measurement'::regclass;
+        """
+    )
+    dropped = []
+    for (name,) in cur.fetchall():
+        try:
+            month_start = datetime.strptime(name, "measurement_y%Ym%m")
+        except ValueError:
+            continue
+        if next_month(month_start) <= cutoff:
+            cur.execute(sql.SQL("DROP TABLE {};").format(sql.Identifier(name)))
+            dropped.append(name)
+    return dropped
+
 
 # Funktion zum Einfügen der Sensebox-Daten
 def insert_sensebox_data(cur, sensebox):
@@ -163,133 +462,414 @@ def insert_sensor_data(cur, sensebox):
 
 
 # Funktion zum Einfügen der Messdaten
+# Die Messwerte werden per COPY in eine temporäre Staging-Tabelle geladen und
+# anschließend mit einem einzigen INSERT .. SELECT in die Tabelle measurement
+# übernommen. Rückgabe: (eingefügte Zeilen, übersprungene Zeilen,
+# frühester und spätester Zeitpunkt der eingefügten Zeilen)
 def insert_measurement_data(cur, sensor, df):
-    insert_measurement_query = """
-    INSERT INTO measurement (sensor_id, created_at, value) VALUES (%s, %s, %s)
-    ON CONFLICT (sensor_id, created_at) DO NOTHING;
-    """
-    for index, row in df.iterrows():
-        cur.execute(
-            insert_measurement_query,
-            (sensor.get("id"), row["createdAt"], row[sensor.get("title")]),
+    if df.empty:
+        return 0, 0, None, None
+
+    # created_at als TIMESTAMPTZ, damit die Umrechnung in TIMESTAMP wie beim
+    # zeilenweisen Einfügen über die Zeitzone der Session erfolgt
+    cur.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS measurement_staging (
+            sensor_id VARCHAR(50),
+            created_at TIMESTAMPTZ,
+            value DECIMAL(10, 2)
+        );
+        TRUNCATE measurement_staging;
+        """
+    )
+
+    buffer = io.StringIO()
+    staging_df = pd.DataFrame(
+        {
+            "sensor_id": sensor.get("id"),
+            "created_at": df["createdAt"],
+            "value": df[sensor.get("title")],
+        }
+    )
+    staging_df.to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+    cur.copy_expert(
+        "COPY measurement_staging (sensor_id, created_at, value) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+
+    if measurement_is_compact(cur):
+        # Kompaktes Layout: sensor_id über die Tabelle sensor auf sensor_key abbilden
+        merge_query = """
+        WITH inserted AS (
+            INSERT INTO measurement (sensor_key, created_at, value)
+            SELECT DISTINCT ON (s.sensor_key, st.created_at)
+                   s.sensor_key, st.created_at, st.value
+            FROM measurement_staging st
+            JOIN sensor s ON s.sensor_id = st.sensor_id
+            ORDER BY s.sensor_key, st.created_at
+            ON CONFLICT (sensor_key, created_at) DO NOTHING
+            RETURNING created_at
+        )
+        SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM inserted;
+        """
+    else:
+        merge_query = """
+        WITH inserted AS (
+            INSERT INTO measurement (sensor_id, created_at, value)
+            SELECT DISTINCT ON (sensor_id, created_at) sensor_id, created_at, value
+            FROM measurement_staging
+            ORDER BY sensor_id, created_at
+            ON CONFLICT (sensor_id, created_at) DO NOTHING
+            RETURNING created_at
         )
+        SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM inserted;
+        """
+    cur.execute(merge_query)
+    inserted, earliest, latest = cur.fetchone()
+
+    # Watermark in derselben Transaktion wie die eingefügten Messwerte nachführen
+    if latest is not None:
+        update_watermark(cur, sensor.get("id"), latest)
+    return inserted, len(staging_df) - inserted, earliest, latest
+
+
+# Funktion zum Erstellen der Watermark-Tabelle (letzter Messzeitpunkt je Sensor)
+def create_watermark_table(cur):
+    create_watermark_query = """
+    CREATE TABLE IF NOT EXISTS ingest_watermark (
+        sensor_id VARCHAR(50) PRIMARY KEY,
+        sensebox_id VARCHAR(50),
+        last_created_at TIMESTAMP,
+        FOREIGN KEY (sensor_id) REFERENCES sensor(sensor_id),
+        FOREIGN KEY (sensebox_id) REFERENCES sensebox(sensebox_id)
+    );
+    """
+    cur.execute(create_watermark_query)
 
 
-def update_last_measurement_at(cur):
+# Funktion zum einmaligen Befüllen der Watermarks aus bestehenden Messdaten
+def seed_watermarks(cur):
+    seed_query = f"""
+    INSERT INTO ingest_watermark (sensor_id, sensebox_id, last_created_at)
+    SELECT s.sensor_id, s.sensebox_id, MAX(m.created_at)
+    FROM sensor s
+    JOIN measurement m ON {measurement_sensor_join(cur)}
+    GROUP BY s.sensor_id, s.sensebox_id
+    ON CONFLICT (sensor_id) DO NOTHING;
+    """
+    cur.execute(seed_query)
+
+
+# Funktion zum Nachführen der Watermark eines Sensors
+def update_watermark(cur, sensor_id, last_created_at):
+    update_query = """
+    INSERT INTO ingest_watermark (sensor_id, sensebox_id, last_created_at)
+    SELECT sensor_id, sensebox_id, %s FROM sensor WHERE sensor_id = %s
+    ON CONFLICT (sensor_id) DO UPDATE SET last_created_at = GREATEST(
+        ingest_watermark.last_created_at, EXCLUDED.last_created_at
+    );
+    """
+    cur.execute(update_query, (last_created_at, sensor_id))
+
+
+# Funktion zum Abrufen der Watermarks aller Sensoren einer senseBox
+def get_watermarks(cur, sensebox_id):
+    cur.execute(
+        "SELECT sensor_id, last_created_at FROM ingest_watermark WHERE sensebox_id = %s;",
+        (sensebox_id,),
+    )
+    return dict(cur.fetchall())
+
+
+# Funktion zum Erstellen der Rollup-Tabelle mit voraggregierten Messwerten
+def create_rollup_table(cur):
+    create_rollup_query = """
+    CREATE TABLE IF NOT EXISTS measurement_rollup (
+        sensor_id VARCHAR(50),
+        bucket_size VARCHAR(1),
+        bucket TIMESTAMP,
+        value_count INTEGER,
+        value_min DECIMAL(10, 2),
+        value_max DECIMAL(10, 2),
+        value_sum DECIMAL(16, 2),
+        PRIMARY KEY (sensor_id, bucket_size, bucket),
+        FOREIGN KEY (sensor_id) REFERENCES sensor(sensor_id)
+    );
+    """
+    cur.execute(create_rollup_query)
+
+
+# Funktion zum Erstellen der Tabellen für die veröffentlichten Vorhersagen
+# Jeder Prognoselauf (ein Sensor) erhält eine fortlaufende run_id mit
+# Modellversion und Trainings-Watermark (letzter Trainingszeitpunkt);
+# forecast enthält die Werte
+def create_forecast_tables(cur):
+    create_forecast_query = """
+    CREATE TABLE IF NOT EXISTS forecast_run (
+        run_id SERIAL PRIMARY KEY,
+        sensor VARCHAR(100),
+        model_version VARCHAR(100),
+        watermark TIMESTAMP,
+        created_at TIMESTAMP DEFAULT now()
+    );
+    CREATE TABLE IF NOT EXISTS forecast (
+        run_id INTEGER,
+        ds TIMESTAMP,
+        y DOUBLE PRECISION,
+        PRIMARY KEY (run_id, ds),
+        FOREIGN KEY (run_id) REFERENCES forecast_run(run_id) ON DELETE CASCADE
+    );
+    CREATE INDEX IF NOT EXISTS forecast_run_sensor_idx ON forecast_run (sensor, run_id);
+    """
+    cur.execute(create_forecast_query)
+
+
+# Funktion zum Aktualisieren der Rollups
+# Alle Zeitfenster von dem Fenster, in das "since" fällt, bis zu dem Fenster,
+# in das "until" fällt, werden aus der Tabelle measurement neu berechnet, bei
+# Angabe von sensor_ids nur für diese Sensoren; ohne Angaben wird die gesamte
+# Historie aller Sensoren aggregiert
+def refresh_rollups(cur, since=None, until=None, sensor_ids=None):
+    join_condition = measurement_sensor_join(cur)
+    for bucket_size, unit in ROLLUP_BUCKETS.items():
+        params = [bucket_size, unit]
+        conditions = []
+        if since is not None:
+            conditions.append("m.created_at >= date_trunc(%s, %s::timestamp)")
+            params += [unit, since]
+        if until is not None:
+            conditions.append(
+                "m.created_at < date_trunc(%s, %s::timestamp) + %s::interval"
+            )
+            params += [unit, until, f"1 {unit}"]
+        if sensor_ids is not None:
+            conditions.append("s.sensor_id = ANY(%s)")
+            params.append(list(sensor_ids))
+        where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+        rollup_query = f"""
+        INSERT INTO measurement_rollup (
+            sensor_id, bucket_size, bucket, value_count, value_min, value_max, value_sum
+        )
+        SELECT s.sensor_id, %s, date_trunc(%s, m.created_at) AS bucket,
+               COUNT(m.value), MIN(m.value), MAX(m.value), SUM(m.value)
+        FROM measurement m
+        JOIN sensor s ON {join_condition}
+        {where_clause}
+        GROUP BY s.sensor_id, bucket
+        ON CONFLICT (sensor_id, bucket_size, bucket) DO UPDATE SET
+            value_count = EXCLUDED.value_count,
+            value_min = EXCLUDED.value_min,
+            value_max = EXCLUDED.value_max,
+            value_sum = EXCLUDED.value_sum;
+        """
+        cur.execute(rollup_query, params)
+
+
+# Funktion zum Aktualisieren von last_measurement_at der angegebenen senseBoxen
+# anhand der Watermarks
+def update_last_measurement_at(cur, sensebox_ids):
     update_query = """
     UPDATE sensebox
     SET last_measurement_at = subquery.last_measurement_at
     FROM (
-        SELECT s.sensebox_id, MAX(m.created_at) AS last_measurement_at
-        FROM sensor s
-        JOIN measurement m ON s.sensor_id = m.sensor_id
-        GROUP BY s.sensebox_id
+        SELECT sensebox_id, MAX(last_created_at) AS last_measurement_at
+        FROM ingest_watermark
+        WHERE sensebox_id = ANY(%s)
+        GROUP BY sensebox_id
     ) AS subquery
     WHERE sensebox.sensebox_id = subquery.sensebox_id;
     """
-    cur.execute(update_query)
+    cur.execute(update_query, (list(sensebox_ids),))
     # print("Last measurement dates updated.")
 
 
-# Funktion zum Abrufen des letzten Messdatums eines Sensors
-def get_last_measurement_date(cur, sensor_id):
-    query = """
-    SELECT MAX(created_at) FROM measurement WHERE sensor_id = %s;
-    """
-    cur.execute(query, (sensor_id,))
-    result = cur.fetchone()
-    return result[0] if result[0] else None
+# Funktion zum Registrieren einer senseBox samt Sensoren in der Datenbank
+def register_sensebox(cur, sensebox_id):
+    response = requests.get(f"https://api.opensensemap.org/boxes/{sensebox_id}")
+    if response.status_code != 200:
+        print(
+            f"Fehler beim Abrufen der Sensebox {sensebox_id}: {response.status_code}"
+        )
+        return False
+    sensebox = response.json()
+    insert_sensebox_data(cur, sensebox)
+    insert_sensor_data(cur, sensebox)
+    print(
+        f"Sensebox Informationen für '{sensebox['name']}' wurden erfolgreich in die Datenbank eingefügt."
+    )
+    return True
 
 
-# Funktion zum Aktualisieren der Datenbank mit neuen Sensordaten
-def update_data():
-    # Verbindung zur spezifischen Datenbank herstellen
-    conn = get_db_connection(DB_DETAILS["dbname"])
-    conn.autocommit = True
-    cur = conn.cursor()
+# Funktion zum Abrufen aller registrierten senseBoxen (Box-Registry)
+def get_registered_sensebox_ids(cur):
+    cur.execute("SELECT sensebox_id FROM sensebox ORDER BY sensebox_id;")
+    return [row[0] for row in cur.fetchall()]
 
-    # Aktuelles Datum und Uhrzeit in ISO 8601 Format mit Zulu-Zeit
-    # end_date = (
-    #     datetime.now(timezone.utc)
-    #     .isoformat(timespec="milliseconds")
-    #     .replace("+00:00", "Z")
-    # )
-    end_date = (datetime.now() - timedelta(hours=2)).isoformat(
-        timespec="milliseconds"
-    ).replace("+00:00", "Z") + "Z"
-    sensor_titles_and_ids = get_sensor_titles_and_ids("6252afcfd7e732001bb6b9f7")
-    now = datetime.now()
-    # print(f"Sensor Informationen werden abgerufen.. {now}")
 
-    for sensor in sensor_titles_and_ids:
-        start_date = get_last_measurement_date(cur, sensor.get("id"))
-        if not start_date:
-            start_date = "2022-01-01T00:00:00.000Z"
+# Funktion zum Aktualisieren der Datenbank mit neuen Sensordaten
+def update_data(sensebox_id=DEFAULT_SENSEBOX_ID):
+    # Verbindung aus dem Pool beziehen
+    with connection() as conn:
+        cur = conn.cursor()
+
+        # Aktuelles Datum und Uhrzeit in ISO 8601 Format mit Zulu-Zeit
+        # end_date = (
+        #     datetime.now(timezone.utc)
+        #     .isoformat(timespec="milliseconds")
+        #     .replace("+00:00", "Z")
+        # )
+        end_date = (datetime.now() - timedelta(hours=2)).isoformat(
+            timespec="milliseconds"
+        ).replace("+00:00", "Z") + "Z"
+        sensor_titles_and_ids = get_sensor_titles_and_ids(sensebox_id)
+        now = datetime.now()
+        # print(f"Sensor Informationen werden abgerufen.. {now}")
+        totals = {"inserted": 0, "skipped": 0}
+
+        # Startdatum je Sensor vorab bestimmen (eine Abfrage für alle Sensoren),
+        # die Pipeline greift nur zum Schreiben auf die Datenbank zu
+        watermarks = get_watermarks(cur, sensebox_id)
+        start_dates = {}
+        for sensor in sensor_titles_and_ids:
+            start_date = watermarks.get(sensor.get("id"))
+            if not start_date:
+                # Ohne Watermark nur die jüngsten Tage laden, die ältere
+                # Historie lädt backfill.py in Zeitfenstern
+                start_date = (
+                    datetime.now(timezone.utc)
+                    - timedelta(days=PIPELINE_CONFIG["initial_days"])
+                ).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+            else:
+                # Konvertiere start_date ins gewünschte Format
+                start_date = (
+                    (start_date - timedelta(hours=2))
+                    .isoformat(timespec="milliseconds")
+                    .replace("+00:00", "Z")
+                ) + "Z"
+            start_dates[sensor.get("id")] = start_date
+
+        # Im Streaming-Modus öffnet die erste Stufe nur die Verbindung, gelesen
+        # wird beim Parsen; daher so viele Parser wie Downloads
+        if PIPELINE_CONFIG["streaming"]:
+            download, parse = stream_sensor_data, parse_sensor_stream
+            parse_workers = PIPELINE_CONFIG["fetch_workers"]
         else:
-            # Konvertiere start_date ins gewünschte Format
-            start_date = (
-                (start_date - timedelta(hours=2))
-                .isoformat(timespec="milliseconds")
-                .replace("+00:00", "Z")
-            ) + "Z"
-        csv_data = fetch_sensor_data(
-            "6252afcfd7e732001bb6b9f7", sensor.get("title"), start_date, end_date
+            download, parse = fetch_sensor_data, parse_sensor_data
+            parse_workers = PIPELINE_CONFIG["parse_workers"]
+
+        def fetch(sensor):
+            return download(
+                sensebox_id,
+                sensor.get("title"),
+                start_dates[sensor.get("id")],
+                end_date,
+            )
+
+        def write(sensor, df):
+            inserted, skipped, earliest, latest = insert_measurement_data(
+                cur, sensor, df
+            )
+            # Rollups des Sensors in derselben Transaktion wie Messwerte und
+            # Watermark nachführen
+            if earliest is not None:
+                refresh_rollups(
+                    cur, since=earliest, until=latest, sensor_ids=[sensor.get("id")]
+                )
+            conn.commit()
+            totals["inserted"] += inserted
+            totals["skipped"] += skipped
+
+        run_pipeline(
+            sensor_titles_and_ids,
+            fetch,
+            parse,
+            write,
+            fetch_workers=PIPELINE_CONFIG["fetch_workers"],
+            parse_workers=parse_workers,
+            queue_size=PIPELINE_CONFIG["queue_size"],
         )
-        if csv_data:
-            df = pd.read_csv(io.StringIO(csv_data), usecols=["value", "createdAt"])
-            df = df.rename(columns={"value": sensor.get("title")})
-            df["createdAt"] = pd.to_datetime(df["createdAt"])
-            df["createdAt"] = df["createdAt"].dt.floor("min")
-            df.sort_values("createdAt", inplace=True)
-            insert_measurement_data(cur, sensor, df)
-            # print(f"Alle Daten ab dem {start_date.replace('T', ' ').split('.')[0]} für Sensor {sensor.get('title')} wurden erfolgreich in die Datenbank eingefügt.")
-    update_last_measurement_at(cur)
-    cur.close()
-    conn.close()
+        if totals["inserted"]:
+            update_last_measurement_at(cur, [sensebox_id])
+        cur.close()
+    return totals["inserted"], totals["skipped"]
 
 
-# Hauptprogramm
-def main():
-    # Sensebox URL
-    sensebox_url = "https://api.opensensemap.org/boxes/6252afcfd7e732001bb6b9f7"
-
+# Funktion zum Einrichten der Datenbank ohne Messdaten: Tabellen, Registrierung
+# der senseBoxen (sensebox_ids, Standard: SENSEBOX_IDS), Partitionen, Indizes,
+# Watermark-, Rollup- und Prognosetabellen. Rückgabe: alle registrierten senseBoxen
+def setup_database(sensebox_ids=None):
     # Datenbank erstellen, falls nicht vorhanden
     create_database()
 
     # Verbindung zur spezifischen Datenbank herstellen
-    conn = get_db_connection(DB_DETAILS["dbname"])
-    conn.autocommit = True
-    cur = conn.cursor()
+    with connection() as conn:
+        cur = conn.cursor()
 
-    # Prüfen, ob die Datenbank bereits existiert
-    cur.execute("SELECT to_regclass('public.sensebox')")
-    db_exists = cur.fetchone()[0] is not None
+        # Prüfen, ob die Datenbank bereits existiert
+        cur.execute("SELECT to_regclass('public.sensebox')")
+        db_exists = cur.fetchone()[0] is not None
 
-    if not db_exists:
-        # Tabellen erstellen, falls sie nicht existieren
-        create_tables(cur)
+        if not db_exists:
+            # Tabellen erstellen, falls sie nicht existieren
+            create_tables(cur)
 
-        # Abrufen der Sensebox-Daten
-        response = requests.get(sensebox_url)
-        sensebox = response.json()
+        # Noch nicht registrierte senseBoxen samt Sensoren einfügen
+        registered = set(get_registered_sensebox_ids(cur))
+        for sensebox_id in sensebox_ids or SENSEBOX_IDS:
+            if sensebox_id not in registered:
+                register_sensebox(cur, sensebox_id)
 
-        # Sensebox-Daten einfügen
-        insert_sensebox_data(cur, sensebox)
+        # Bei partitionierter Tabelle die Partitionen im Voraus anlegen
+        if is_partitioned(cur):
+            ensure_partitions(cur)
 
-        # Sensor-Daten einfügen
-        insert_sensor_data(cur, sensebox)
+        create_indexes(cur)
 
-        print(
-            f"Sensebox Informationen für '{sensebox['name']}' wurden erfolgreich in die Datenbank eingefügt."
-        )
+        # Watermark-Tabelle anlegen und bei bestehenden Daten einmalig befüllen
+        create_watermark_table(cur)
+        cur.execute("SELECT EXISTS (SELECT 1 FROM ingest_watermark)")
+        if not cur.fetchone()[0]:
+            seed_watermarks(cur)
 
-    # Aktualisieren Sie die Datenbank mit neuen Sensordaten
-    update_data()
+        # Rollup-Tabelle anlegen und bei bestehenden Daten einmalig befüllen
+        create_rollup_table(cur)
+        cur.execute("SELECT EXISTS (SELECT 1 FROM measurement_rollup)")
+        if not cur.fetchone()[0]:
+            refresh_rollups(cur)
 
-    # Verbindung schließen
-    cur.close()
-    conn.close()
+        create_forecast_tables(cur)
+
+        sensebox_ids = get_registered_sensebox_ids(cur)
+        cur.close()
+    return sensebox_ids
 
 
+# Hauptprogramm
+def main():
+    sensebox_ids = setup_database()
+
+    # Die Historie neuer Sensoren lädt der Backfill in Zeitfenstern,
+    # update_data übernimmt danach nur die neuen Messwerte
+    from backfill import main as backfill, needs_backfill
+
+    with connection() as conn:
+        cur = conn.cursor()
+        backfill_ids = [
+            sensebox_id
+            for sensebox_id in sensebox_ids
+            if needs_backfill(cur, sensebox_id)
+        ]
+        cur.close()
+    for sensebox_id in backfill_ids:
+        backfill(sensebox_id)
+
+    # Aktualisieren Sie die Datenbank mit neuen Sensordaten
+    for sensebox_id in sensebox_ids:
+        inserted, skipped = update_data(sensebox_id)
+        print(
+            f"{sensebox_id}: {inserted} Messwerte eingefügt, {skipped} bereits vorhandene übersprungen."
+        )
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,62 @@
+import argparse
+from db import connection
+from initialize import migrate_to_compact
+
+
+# Funktion zum Zählen der übrigen Verbindungen zur Datenbank; laufende
+# Prozesse (Dashboard, Scheduler, Forecast-Worker) merken sich das Layout der
+# Tabelle measurement und schreiben nach der Migration ins alte Layout
+def count_other_sessions(cur):
+    cur.execute(
+        """
+        SELECT COUNT(*) FROM pg_stat_activity
+        WHERE datname = current_database() AND pid <> pg_backend_pid();
+        """
+    )
+    return cur.fetchone()[0]
+
+
+# Hauptprogramm: überführt die Tabelle measurement in das kompakte Layout
+# (smallint sensor_key, ohne measurement_id, Werte als real)
+def main(force=False):
+    with connection() as conn:
+        cur = conn.cursor()
+        other_sessions = count_other_sessions(cur)
+        if other_sessions and not force:
+            print(
+                f"Abbruch: {other_sessions} weitere Verbindung(en) zur Datenbank. "
+                "Dashboard, Scheduler und Forecast-Worker vor der Migration "
+                "beenden oder mit --force migrieren und danach neu starten."
+            )
+            cur.close()
+            raise SystemExit(1)
+
+        cur.execute("SELECT pg_size_pretty(pg_total_relation_size('measurement'));")
+        size_before = cur.fetchone()[0]
+
+        if migrate_to_compact(cur):
+            cur.execute("ANALYZE measurement;")
+            cur.execute(
+                "SELECT pg_size_pretty(pg_total_relation_size('measurement'));"
+            )
+            size_after = cur.fetchone()[0]
+            print(f"Größe der Tabelle measurement: {size_before} -> {size_after}")
+            if other_sessions:
+                print(
+                    "Warnung: Alle übrigen Prozesse neu starten, sie verwenden "
+                    "noch das alte Layout."
+                )
+        cur.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Überführt die Tabelle measurement in das kompakte Layout"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="auch migrieren, wenn andere Prozesse mit der Datenbank verbunden sind",
+    )
+    args = parser.parse_args()
+    main(args.force)
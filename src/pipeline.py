@@ -0,0 +1,167 @@
+import queue
+import threading
+
+# Markiert das Ende eines Datenstroms zwischen zwei Stufen
+_STOP = object()
+
+# Markiert, dass alle Batches eines Elements geschrieben wurden
+_ITEM_DONE = object()
+
+
+# Legt ein Element in die Warteschlange, bricht aber ab, sobald die Pipeline
+# gestoppt wurde (sonst blockiert ein Worker bei voller Queue für immer)
+def _put(q, item, stop_event):
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+# Gibt die Ressourcen eines Elements frei (z.B. eine offene Streaming-Antwort
+# oder einen angefangenen Parser-Generator), falls es eine close()-Methode hat
+def _close(payload):
+    close = getattr(payload, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception as e:
+            print(f"Fehler beim Schließen von {payload!r}: {e}")
+
+
+# Leert eine Warteschlange nach dem Stoppen und gibt die verbliebenen
+# Elemente frei
+def _drain(q):
+    while True:
+        try:
+            entry = q.get_nowait()
+        except queue.Empty:
+            return
+        if entry is not _STOP:
+            _close(entry[1])
+
+
+def _fetch_worker(work_queue, parse_queue, fetch, stop_event):
+    while not stop_event.is_set():
+        try:
+            item = work_queue.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            payload = fetch(item)
+        except Exception as e:
+            print(f"Fehler beim Abrufen von {item}: {e}")
+            continue
+        if payload and not _put(parse_queue, (item, payload), stop_event):
+            _close(payload)
+
+
+def _parse_worker(parse_queue, write_queue, parse, stop_event):
+    while not stop_event.is_set():
+        try:
+            entry = parse_queue.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        if entry is _STOP:
+            return
+        item, payload = entry
+        batches = None
+        try:
+            batches = parse(item, payload)
+            for batch in batches:
+                if not _put(write_queue, (item, batch), stop_event):
+                    return
+            if not _put(write_queue, (item, _ITEM_DONE), stop_event):
+                return
+        except Exception as e:
+            print(f"Fehler beim Verarbeiten von {item}: {e}")
+        finally:
+            # Auch bei Abbruch: Generator und Rohdaten (Streaming-Antwort) schließen
+            _close(batches)
+            _close(payload)
+
+
+# Schließt die Stufen der Reihe nach, sobald alle Worker einer Stufe fertig sind
+# Wurde die Pipeline gestoppt, werden danach die Queues geleert und noch offene
+# Antworten geschlossen; erst dann legt kein Worker mehr etwas nach
+def _close_stages(fetch_threads, parse_threads, parse_queue, write_queue, stop_event):
+    for thread in fetch_threads:
+        thread.join()
+    for _ in parse_threads:
+        _put(parse_queue, _STOP, stop_event)
+    for thread in parse_threads:
+        thread.join()
+    _put(write_queue, _STOP, stop_event)
+    if stop_event.is_set():
+        _drain(parse_queue)
+        _drain(write_queue)
+
+
+# Dreistufige Pipeline: Abrufen -> Verarbeiten -> Schreiben
+# fetch(item) liefert die Rohdaten, parse(item, payload) liefert beliebig viele
+# Batches, write(item, batch) wird im aufrufenden Thread ausgeführt, damit eine
+# einzelne Datenbankverbindung genügt. Die begrenzten Queues sorgen für
+# Backpressure: ist der Schreiber langsam, warten Verarbeitung und Download.
+# on_item_done(item) wird (ebenfalls im aufrufenden Thread) aufgerufen, sobald
+# alle Batches eines Elements fehlerfrei geschrieben wurden.
+def run_pipeline(
+    items,
+    fetch,
+    parse,
+    write,
+    fetch_workers=4,
+    parse_workers=2,
+    queue_size=8,
+    on_item_done=None,
+):
+    work_queue = queue.Queue()
+    for item in items:
+        work_queue.put(item)
+    parse_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+
+    fetch_threads = [
+        threading.Thread(
+            target=_fetch_worker,
+            args=(work_queue, parse_queue, fetch, stop_event),
+            daemon=True,
+        )
+        for _ in range(max(1, fetch_workers))
+    ]
+    parse_threads = [
+        threading.Thread(
+            target=_parse_worker,
+            args=(parse_queue, write_queue, parse, stop_event),
+            daemon=True,
+        )
+        for _ in range(max(1, parse_workers))
+    ]
+    closer = threading.Thread(
+        target=_close_stages,
+        args=(fetch_threads, parse_threads, parse_queue, write_queue, stop_event),
+        daemon=True,
+    )
+    for thread in fetch_threads + parse_threads:
+        thread.start()
+    closer.start()
+
+    try:
+        while True:
+            entry = write_queue.get()
+            if entry is _STOP:
+                break
+            item, batch = entry
+            if batch is _ITEM_DONE:
+                if on_item_done is not None:
+                    on_item_done(item)
+            else:
+                write(item, batch)
+    except BaseException:
+        # Worker-Threads beenden, damit sie nicht an vollen Queues hängen
+        # bleiben; die Queues leert anschließend _close_stages
+        stop_event.set()
+        raise
+    closer.join()
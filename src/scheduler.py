@@ -1,18 +1,121 @@
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
-from initialize import update_data
-from utils import train_and_update_forecast, fetch_and_prepare_data
+from db import connection
+from forecast_worker import create_forecast_executor, run_forecast
+from forecasters import sensor_slug
+from initialize import get_registered_sensebox_ids, maintain_partitions, update_data
+from utils import FORECAST_SENSORS
+
+# Ingest scheduling: boxes are spread over ingest_shards jobs which run on up to
+# ingest_workers threads; the shard jobs are staggered over stagger_seconds so
+# they don't all start at the top of the minute. Each shard job works through
+# its boxes one after another, so the concurrency is min(shards, workers);
+# ingest_shards None means one shard per worker
+SCHEDULER_CONFIG = {
+    "ingest_shards": None,
+    "ingest_workers": 4,
+    "stagger_seconds": 60,
+}
+
+# Duration and result of the last ingest run per box
+_box_timings = {}
+_box_timings_lock = threading.Lock()
+
+
+def get_shard(sensebox_id, shards):
+    # Stable assignment, independent of the order in the registry
+    return zlib.crc32(sensebox_id.encode("utf-8")) % shards
+
+
+def update_box(sensebox_id):
+    started = time.monotonic()
+    try:
+        inserted, skipped = update_data(sensebox_id)
+        error = None
+    except Exception as e:
+        inserted, skipped, error = 0, 0, str(e)
+        print(f"Ingest for {sensebox_id} failed: {e}")
+    with _box_timings_lock:
+        _box_timings[sensebox_id] = {
+            "finished_at": datetime.now(),
+            "duration": time.monotonic() - started,
+            "inserted": inserted,
+            "skipped": skipped,
+            "error": error,
+        }
+
+
+def run_ingest_shard(shard, shards):
+    with connection() as conn:
+        cur = conn.cursor()
+        sensebox_ids = get_registered_sensebox_ids(cur)
+        cur.close()
+    for sensebox_id in sensebox_ids:
+        if get_shard(sensebox_id, shards) == shard:
+            update_box(sensebox_id)
+
+
+def get_box_timings():
+    with _box_timings_lock:
+        return {box: dict(timing) for box, timing in _box_timings.items()}
 
 
 def start_scheduler():
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(
-        update_data, "interval", minutes=1, id="update_data_job", replace_existing=True
+    shards = SCHEDULER_CONFIG["ingest_shards"] or SCHEDULER_CONFIG["ingest_workers"]
+    # Forecast training runs in a separate worker process, never in the
+    # threads of the web server
+    scheduler = BackgroundScheduler(
+        executors={
+            "default": ThreadPoolExecutor(SCHEDULER_CONFIG["ingest_workers"]),
+            "forecast": create_forecast_executor(),
+        }
     )
+    now = datetime.now()
+    for shard in range(shards):
+        offset = SCHEDULER_CONFIG["stagger_seconds"] * shard / shards
+        scheduler.add_job(
+            run_ingest_shard,
+            "interval",
+            minutes=1,
+            start_date=now + timedelta(seconds=offset),
+            args=[shard, shards],
+            id=f"update_data_job_{shard}",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
     scheduler.add_job(
-        train_and_update_forecast,
+        maintain_partitions,
         "cron",
-        minute=0,  # This ensures the job runs at the top of every hour
-        id="forecast_job",
+        hour=0,
+        minute=30,
+        id="partition_job",
         replace_existing=True,
     )
+    # One forecast job per sensor, so the forecast executor fits them in parallel
+    for sensor in FORECAST_SENSORS:
+        slug = sensor_slug(sensor)
+        scheduler.add_job(
+            run_forecast,
+            "cron",
+            minute=0,  # This ensures the job runs at the top of every hour
+            args=[sensor],
+            id=f"forecast_job_{slug}",
+            executor="forecast",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        # First forecast right after startup
+        scheduler.add_job(
+            run_forecast,
+            args=[sensor],
+            id=f"forecast_initial_job_{slug}",
+            executor="forecast",
+            replace_existing=True,
+        )
     scheduler.start()
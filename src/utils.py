@@ -1,42 +1,191 @@
+import os
 import pandas as pd
-from fetch import fetch_and_pivot_sensor_data
-from neuralprophet import NeuralProphet
+from psycopg2.extras import execute_values
+from db import DEFAULT_SENSEBOX_ID, connection
+from fetch import fetch_cached_sensor_frame
+from forecasters import FORECASTERS, create_forecaster
 import shutil
-from datetime import datetime
+from datetime import datetime, timedelta
 
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def fetch_and_prepare_data():
-    df_pivot = fetch_and_pivot_sensor_data()
-    return df_pivot
+# Forecast training settings
+# sensebox_id is the box whose sensors are forecast.
+# engine selects the forecaster (see forecasters.FORECASTERS): "neuralprophet",
+# or the NumPy engines "holt_winters" and "seasonal_naive" for small hosts
+# without torch; season_length is the season of the NumPy engines in hours.
+# The NeuralProphet model is checkpointed to model_dir together with its
+# training watermark.
+# Hourly runs forecast with the checkpoint from the hours that arrived since
+# then; a full retrain from scratch happens every full_retrain_hours.
+# Sensors with fewer than min_train_rows hourly values are not forecast.
+# Only the last training_weeks of hourly data are used (None = all history).
+# Published forecast runs older than the newest keep_runs are deleted.
+# The scheduler fits the sensors in parallel, one job per sensor, on up to
+# max_workers processes (None = one per CPU core); the cores are split evenly
+# between them.
+FORECAST_CONFIG = {
+    "sensebox_id": DEFAULT_SENSEBOX_ID,
+    "engine": "neuralprophet",
+    "season_length": 24,
+    "model_dir": os.path.abspath(os.path.join(CURRENT_DIR, "..", "models")),
+    "full_epochs": 100,
+    "min_train_rows": 24,
+    "full_retrain_hours": 24,
+    "periods": 6,
+    "training_weeks": 8,
+    "keep_runs": 48,
+    "max_workers": 4,
+}
 
+# Forecast sensors and the aggregation of their hourly values
+FORECAST_SENSORS = {
+    "Temperature in °C": "max",
+    "Humidity in %": "avg",
+    "Pressure in hPa": "avg",
+    "Windspeed in m/s": "avg",
+    "Rain (1h) in mm": "sum",
+    "UV-A Radiation in W/m2": "avg",
+    "UV-B Radiation in W/m2": "avg",
+}
 
-def train_and_predict(df):
-    now = datetime.now()
-    hourly_forecast = df[["created_at", "Temperature in °C"]].dropna()
+
+def training_window_start():
+    if FORECAST_CONFIG["training_weeks"] is None:
+        return None
+    return datetime.now() - timedelta(weeks=FORECAST_CONFIG["training_weeks"])
+
+
+def fetch_training_data(sensors=None):
+    # Hourly values of the forecast sensors within the training window,
+    # aggregated in the database with one query per aggregation; the frames are
+    # cached per worker process, so an hourly run only reads the newest hours
+    sensors = sensors or list(FORECAST_SENSORS)
+    by_agg = {}
+    for sensor in sensors:
+        by_agg.setdefault(FORECAST_SENSORS.get(sensor, "avg"), []).append(sensor)
+
+    df = None
+    for agg, agg_sensors in by_agg.items():
+        frame = fetch_cached_sensor_frame(
+            start=training_window_start(),
+            sensors=agg_sensors,
+            bucket="H",
+            agg=agg,
+            sensebox_id=FORECAST_CONFIG["sensebox_id"],
+        )
+        df = frame if df is None else df.merge(frame, on="created_at", how="outer")
+    return df.sort_values("created_at").reset_index(drop=True)
+
+
+def prepare_hourly_series(df, sensor="Temperature in °C"):
+    hourly_forecast = df[["created_at", sensor]].dropna()
     hourly_forecast.set_index("created_at", inplace=True)
-    hourly_forecast["Temperature in °C"] = hourly_forecast["Temperature in °C"].astype(
-        float
-    )
+    hourly_forecast[sensor] = hourly_forecast[sensor].astype(float)
     hourly_forecast = hourly_forecast.resample("1H").max().dropna()
     hourly_forecast.reset_index(inplace=True)
     hourly_forecast.columns = ["ds", "y"]
+    if FORECAST_CONFIG["training_weeks"] is not None and not hourly_forecast.empty:
+        window_start = hourly_forecast["ds"].iloc[-1] - timedelta(
+            weeks=FORECAST_CONFIG["training_weeks"]
+        )
+        hourly_forecast = hourly_forecast[hourly_forecast["ds"] > window_start]
     now = datetime.now()
     if now.minute != 0:
         hourly_forecast = hourly_forecast[
             :-1
         ]  # Remove the last hour only if we are not at the full hour
-    m = NeuralProphet()
-    model = m.fit(hourly_forecast, freq="H", epochs=100)
-    future = m.make_future_dataframe(hourly_forecast, periods=6)
-    forecast = m.predict(future)
-    forecast = forecast[["ds", "yhat1"]]
-    forecast.columns = ["ds", "y"]
+    return hourly_forecast
+
+
+def create_sensor_forecaster(sensor):
+    return create_forecaster(FORECAST_CONFIG["engine"], FORECAST_CONFIG, sensor)
+
+
+def predict_series(hourly_forecast, sensor="Temperature in °C"):
+    forecaster = create_sensor_forecaster(sensor).fit(hourly_forecast)
+    forecast = forecaster.predict(FORECAST_CONFIG["periods"])
+    return pd.concat([hourly_forecast[-3:], forecast]), forecaster.state
+
+
+def train_and_predict(df, sensor="Temperature in °C"):
+    forecast_df, _ = predict_series(prepare_hourly_series(df, sensor), sensor)
+    shutil.rmtree("lightning_logs", ignore_errors=True)
+    return forecast_df
+
+
+def init_forecast_worker(threads, engine=None):
+    # Limit torch's intra-op threads so the workers don't oversubscribe the CPU
+    if FORECASTERS[engine or FORECAST_CONFIG["engine"]].isolated:
+        import torch
+
+        torch.set_num_threads(threads)
+
+
+def train_and_predict_all(df, sensors=None):
+    # Fit the given sensors one after another in this process; in operation
+    # every sensor is a job of its own on the forecast executor (see
+    # forecast_worker), which runs them in parallel.
+    # Returns {sensor: (forecast_df, state)}
+    results = {}
+    for sensor in sensors or list(FORECAST_SENSORS):
+        if sensor not in df.columns:
+            continue
+        hourly_forecast = prepare_hourly_series(df, sensor)
+        if len(hourly_forecast) < FORECAST_CONFIG["min_train_rows"]:
+            continue
+        try:
+            results[sensor] = predict_series(hourly_forecast, sensor)
+        except Exception as e:
+            print(f"Forecast for {sensor} failed: {e}")
     shutil.rmtree("lightning_logs", ignore_errors=True)
-    return pd.concat([hourly_forecast[-3:], forecast])
+    return results
+
+
+def publish_forecasts(results):
+    # One run per sensor; all runs and their values are written in one
+    # transaction, so readers only ever see complete runs
+    run_ids = {}
+    with connection() as conn:
+        cur = conn.cursor()
+        for sensor, (forecast_df, state) in results.items():
+            cur.execute(
+                """
+                INSERT INTO forecast_run (sensor, model_version, watermark)
+                VALUES (%s, %s, %s) RETURNING run_id;
+                """,
+                (sensor, state["model_version"], state["watermark"]),
+            )
+            run_id = cur.fetchone()[0]
+            execute_values(
+                cur,
+                "INSERT INTO forecast (run_id, ds, y) VALUES %s;",
+                [
+                    (run_id, ds.to_pydatetime(), float(y))
+                    for ds, y in zip(forecast_df["ds"], forecast_df["y"])
+                ],
+            )
+            run_ids[sensor] = run_id
+        cur.execute(
+            """
+            DELETE FROM forecast_run WHERE run_id IN (
+                SELECT run_id FROM (
+                    SELECT run_id, row_number() OVER (
+                        PARTITION BY sensor ORDER BY run_id DESC
+                    ) AS rank
+                    FROM forecast_run
+                    WHERE sensor = ANY(%s)
+                ) runs
+                WHERE rank > %s
+            );
+            """,
+            (list(run_ids), FORECAST_CONFIG["keep_runs"]),
+        )
+        cur.close()
+    return run_ids
 
 
-def train_and_update_forecast():
-    global forecast_df
-    df = fetch_and_prepare_data()
-    forecast_df = train_and_predict(df)
-    print("Forecast updated.")
+def train_and_update_forecast(sensors=None):
+    df = fetch_training_data(sensors)
+    run_ids = publish_forecasts(train_and_predict_all(df, sensors))
+    print(f"Forecasts updated: {', '.join(run_ids) or 'none'}.")